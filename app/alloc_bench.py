@@ -0,0 +1,116 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from pyglfw.headless import create_context
+
+from OpenGL.GL import *
+
+from pyglfw.model import ColorModel
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+def legacy_build(vertices, color, normals):
+    # Geometry building before the preallocated buffer, kept as reference
+    num = vertices.shape[0]
+    colors = np.tile(np.array(color, dtype='float32'), num).reshape((num, 3))
+    v = vertices
+    for attr in (colors, normals):
+        v = np.column_stack((v, attr))
+    return v
+
+
+def measure(func, updates):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    for i in range(updates):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func(i)
+        peak = tracemalloc.get_traced_memory()[1] - base
+    elapsed = time.perf_counter() - start
+    tracemalloc.stop()
+
+    # Peak of the last update is reported as the steady state
+    return elapsed * 1000.0 / updates, peak
+
+
+def main():
+    global verbose
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        default=False,
+        help='Print debug string'
+    )
+    parser.add_argument(
+        '--vertices', '-n',
+        type=int,
+        default=1000000,
+        help='Vertex count of the mesh'
+    )
+    parser.add_argument(
+        '--updates', '-u',
+        type=int,
+        default=10,
+        help='Number of geometry updates to measure'
+    )
+
+    args = parser.parse_args()
+    verbose = args.verbose
+    num = args.vertices
+
+    create_context()
+
+    rng = np.random.default_rng(0)
+    positions = [
+        rng.random((num, 3), dtype=np.float32),
+        rng.random((num, 3), dtype=np.float32),
+    ]
+    normals = rng.random((num, 3), dtype=np.float32)
+    color = (1.0, 0.5, 0.0)
+
+    model = ColorModel(
+        vertices=positions[0],
+        color=color,
+        attributes={'normal': normals},
+        usage=GL_DYNAMIC_DRAW
+    )
+    model.prepare()
+    # First update allocates the buffers
+    model._update_geometry()
+
+    def _update(i):
+        model.vertices = positions[i % 2]
+        model._update_geometry()
+
+    def _legacy(i):
+        legacy_build(positions[i % 2], color, normals)
+
+    mesh_bytes = num * 9 * 4
+    legacy_ms, legacy_peak = measure(_legacy, args.updates)
+    update_ms, update_peak = measure(_update, args.updates)
+
+    print('mesh: {} vertices, {:.1f} MB interleaved'.format(
+        num, mesh_bytes / 1e6
+    ))
+    print('legacy column_stack build: {:8.2f} ms, {:12d} bytes allocated'
+          .format(legacy_ms, legacy_peak))
+    print('preallocated update:       {:8.2f} ms, {:12d} bytes allocated'
+          .format(update_ms, update_peak))
+
+
+if __name__ == '__main__':
+    main()
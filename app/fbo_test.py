@@ -2,7 +2,7 @@ import sys
 
 from OpenGL.GL import *
 from PyQt5.QtWidgets import QApplication
-from pyglfw.fbo import Framebuffer
+from pyglfw.fbo import FramebufferPool
 from pyglfw.framework import VertexObject
 from pyglfw.renderer import Renderer
 from pyglfw.renderer import TriangleRenderer
@@ -21,17 +21,22 @@ def debug(msg):
 
 class FramebufferRenderer(TextureRenderer):
 
-    def __init__(self, name=''):
+    # The offscreen target is taken from a FramebufferPool for the
+    # duration of each pass
+    def __init__(self, name='', pool=None):
+        self._pool = pool or FramebufferPool()
         self._framebuffer = None
+        self._width = 50
+        self._height = 50
         self._inner_renderer = TriangleRenderer()
         super().__init__(name=name)
 
     def prepare(self):
         super().prepare()
         self._inner_renderer.prepare()
-        self._framebuffer = Framebuffer(width=50, height=50)
 
     def render(self):
+        self._framebuffer = self._pool.acquire(self._width, self._height)
         with self._framebuffer:
             glClearColor(0.0, 0.0, 0.0, 1.0)
             glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
@@ -39,24 +44,29 @@ class FramebufferRenderer(TextureRenderer):
 
         super().render()
 
+        self._pool.recycle(self._framebuffer)
+        self._framebuffer = None
+        self._pool.next_frame()
+
     def dispose(self):
         super().dispose()
         self._framebuffer = None
+        self._pool.clear()
         self._inner_renderer.dispose()
 
     def setFramebufferSize(self, w=-1, h=-1):
         print('setFramebufferSize: {}, {}'.format(w, h))
 
-        if w < 0:
-            w = self._framebuffer.width
-        if h < 0:
-            h = self._framebuffer.height
-
-        self._framebuffer.width = w
-        self._framebuffer.height = h
+        if w >= 0:
+            self._width = w
+        if h >= 0:
+            self._height = h
 
+    # None outside of render()
     @property
     def texture(self):
+        if self._framebuffer is None:
+            return None
         return self._framebuffer.texture
 
 
@@ -15,7 +15,11 @@ class FlipRenderer(TextureRenderer):
             name='',
             width=100,
             height=100,
-            inner_renderer=None):
+            inner_renderer=None,
+            pool=None,
+            samples=0):
+        self._pool = pool
+        self._samples = samples
         self._pending_width = -1
         self._pending_height = -1
         self._width = 0
@@ -48,6 +52,12 @@ class FlipRenderer(TextureRenderer):
 
     def render(self):
         self._check_size()
+        if self._pool is not None:
+            # A pooled target is only held during this pass
+            self._framebuffer = self._pool.acquire(
+                self.width, self.height,
+                samples=self._samples
+            )
         if self._framebuffer is None:
             return
 
@@ -58,6 +68,12 @@ class FlipRenderer(TextureRenderer):
 
         super().render()
 
+        if self._pool is not None:
+            # The pool may hand the target out again, so its texture is
+            # not ours after this pass
+            self._pool.recycle(self._framebuffer)
+            self._framebuffer = None
+
     def dispose(self):
         super().dispose()
 
@@ -79,16 +95,25 @@ class FlipRenderer(TextureRenderer):
             self._height = self._pending_height
         self._pending_width = self._pending_height = -1
 
+        if self._pool is not None:
+            return True
         if self._framebuffer is None:
-            self._framebuffer = Framebuffer(width=self.width, height=self.height)
+            self._framebuffer = Framebuffer(
+                width=self.width,
+                height=self.height,
+                samples=self._samples
+            )
         else:
             self._framebuffer.width = self.width
             self._framebuffer.height = self.height
 
         return True
 
+    # None outside of render() when the target is pooled
     @property
     def texture(self):
+        if self._framebuffer is None:
+            return None
         return self._framebuffer.texture
 
     @property
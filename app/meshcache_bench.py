@@ -0,0 +1,137 @@
+import argparse
+import glob
+import json
+import numpy as np
+import os
+import shutil
+import tempfile
+import time
+
+from pyglfw import meshcache
+from pyglfw import model
+from pyglfw import scene
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+def best_of(func, repeat):
+    best = None
+    for __ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000.0
+
+
+def bench_scene(jsonpath, repeat):
+    with open(jsonpath) as f:
+        desc = json.load(f)
+    basepath = os.path.dirname(jsonpath)
+    resources = desc.get('resources', [])
+
+    meshcache.build_scene(jsonpath)
+    json_ms = best_of(
+        lambda: scene.load_resources(resources, basepath, use_cache=False),
+        repeat
+    )
+    cache_ms = best_of(
+        lambda: scene.load_resources(resources, basepath, use_cache=True),
+        repeat
+    )
+    return json_ms, cache_ms
+
+
+def bench_synthetic(vertex_count, repeat):
+    rng = np.random.default_rng(0)
+    desc = {
+        'name': 'synthetic',
+        'vertices': rng.random((vertex_count, 3)).tolist(),
+        'faces': rng.integers(
+            0, vertex_count, (vertex_count * 2, 3)
+        ).tolist(),
+        'attributes': {
+            'normal': rng.random((vertex_count, 3)).tolist(),
+        },
+    }
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        jsonpath = os.path.join(tempdir, 'synthetic.json')
+        with open(jsonpath, 'w') as f:
+            json.dump(desc, f)
+
+        meshcache.write_cache(jsonpath)
+        json_ms = best_of(
+            lambda: model.load_fromjson(jsonpath, use_cache=False),
+            repeat
+        )
+        cache_ms = best_of(
+            lambda: model.load_fromjson(jsonpath, use_cache=True),
+            repeat
+        )
+    return json_ms, cache_ms
+
+
+def main():
+    global verbose
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        default=False,
+        help='Print debug string'
+    )
+    parser.add_argument(
+        '--resdir', '-d',
+        default='example/res',
+        help='Directory of scene JSON files'
+    )
+    parser.add_argument(
+        '--synthetic', '-n',
+        type=int,
+        default=200000,
+        help='Vertex count of a synthetic mesh (0 to skip)'
+    )
+    parser.add_argument(
+        '--repeat', '-r',
+        type=int,
+        default=5,
+        help='Best of N runs'
+    )
+
+    args = parser.parse_args()
+    verbose = args.verbose
+    model.verbose = verbose
+    # Measure the cache even for the tiny example models
+    meshcache.min_cache_size = 0
+
+    print('{:<32} {:>10} {:>10}'.format('scene', 'json ms', 'cache ms'))
+    # Caches are written next to the models, so the scenes are copied to
+    # keep them out of the source tree
+    with tempfile.TemporaryDirectory() as tempdir:
+        resdir = os.path.join(tempdir, 'res')
+        shutil.copytree(args.resdir, resdir)
+        pattern = os.path.join(resdir, 'scene_*.json')
+        for jsonpath in sorted(glob.glob(pattern)):
+            json_ms, cache_ms = bench_scene(jsonpath, args.repeat)
+            print('{:<32} {:>10.3f} {:>10.3f}'.format(
+                os.path.basename(jsonpath), json_ms, cache_ms
+            ))
+
+    if args.synthetic > 0:
+        json_ms, cache_ms = bench_synthetic(args.synthetic, args.repeat)
+        print('{:<32} {:>10.3f} {:>10.3f}'.format(
+            'synthetic ({} vertices)'.format(args.synthetic),
+            json_ms, cache_ms
+        ))
+
+
+if __name__ == '__main__':
+    main()
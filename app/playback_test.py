@@ -0,0 +1,151 @@
+import argparse
+import cv2
+import numpy as np
+import os
+import tempfile
+import time
+
+from pyglfw.video import VideoPlayer
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+# Frame index is drawn as black and white blocks, which survive lossy codecs
+BITS = 10
+BLOCK = 32
+
+
+def write_synthetic(path, frames, fps):
+    writer = cv2.VideoWriter(
+        path,
+        cv2.VideoWriter_fourcc(*'MJPG'),
+        fps,
+        (BITS * BLOCK, BLOCK)
+    )
+    for index in range(frames):
+        image = np.zeros((BLOCK, BITS * BLOCK, 3), dtype=np.uint8)
+        for bit in range(BITS):
+            if index & (1 << bit):
+                image[:, bit * BLOCK:(bit + 1) * BLOCK] = 255
+        writer.write(image)
+    writer.release()
+
+
+def frame_index(image):
+    index = 0
+    for bit in range(BITS):
+        block = image[:, bit * BLOCK:(bit + 1) * BLOCK]
+        if block.mean() > 127:
+            index |= 1 << bit
+    return index
+
+
+def play(player, seconds):
+    # Records (wall time, frame index) of every presented frame
+    presented = []
+
+    def _on_frame(sequence):
+        __, image = player.read()
+        presented.append((time.perf_counter(), frame_index(image)))
+
+    player.add_listener(_on_frame)
+    player.start()
+    time.sleep(seconds)
+    player.stop()
+    player.remove_listener(_on_frame)
+    return presented
+
+
+def report(name, presented, fps, rate):
+    if len(presented) < 2:
+        print('{:<12} no frames'.format(name))
+        return
+
+    times = np.array([t for t, __ in presented])
+    indices = np.array([i for __, i in presented])
+    # Wall time each frame was due relative to the first presented one
+    due = times[0] + (indices - indices[0]) / (fps * rate)
+    error = np.abs(times - due) * 1000.0
+    in_order = bool(np.all(np.diff(indices) > 0))
+
+    print('{:<12} {:>6d} frames, {:>6.1f} fps, pacing error mean {:.2f} ms '
+          'max {:.2f} ms, in order: {}'.format(
+              name,
+              len(presented),
+              (len(presented) - 1) / (times[-1] - times[0]),
+              error.mean(),
+              error.max(),
+              in_order
+          ))
+
+
+def main():
+    global verbose
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        default=False,
+        help='Print debug string'
+    )
+    parser.add_argument(
+        '--fps',
+        type=float,
+        default=30.0,
+        help='Frame rate of the synthetic video'
+    )
+    parser.add_argument(
+        '--frames', '-n',
+        type=int,
+        default=600,
+        help='Frame count of the synthetic video'
+    )
+    parser.add_argument(
+        '--seconds', '-s',
+        type=float,
+        default=2.0,
+        help='Playback time per case'
+    )
+
+    args = parser.parse_args()
+    verbose = args.verbose
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = os.path.join(tempdir, 'synthetic.avi')
+        write_synthetic(path, args.frames, args.fps)
+        player = VideoPlayer(path)
+        debug('duration: {:.2f} s'.format(player.duration))
+
+        for rate in (1.0, 2.0, 0.5):
+            player.seek(0.0)
+            player.rate = rate
+            presented = play(player, args.seconds)
+            report('rate {}'.format(rate), presented, args.fps, rate)
+
+        # Seek lands on the first frame at or after the position
+        errors = 0
+        targets = np.linspace(0.0, player.duration * 0.9, 10)
+        for position in targets:
+            player.seek(position)
+            __, image = player.read()
+            expected = int(np.ceil(position * args.fps - 0.5))
+            if frame_index(image) != expected:
+                errors += 1
+                debug('seek {:.3f}: frame {} != {}'.format(
+                    position, frame_index(image), expected
+                ))
+        print('seek: {} of {} positions off'.format(errors, len(targets)))
+        print('skipped: {}, dropped: {}'.format(
+            player.skipped_frames, player.dropped_frames
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+import argparse
+import time
+
+import numpy as np
+
+from pyglfw.headless import create_context
+
+from OpenGL.GL import *
+
+from pyglfw.fbo import Framebuffer
+from pyglfw.renderer import TriangleRenderer
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+def draw(framebuffer, renderer, frame):
+    with framebuffer:
+        glClearColor((frame % 10) / 10.0, 0.0, 0.0, 1.0)
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        renderer.render()
+
+
+# Channels of a read_async format taken from RGBA pixels
+FORMAT_CHANNELS = (
+    ('GL_RED', GL_RED, [0]),
+    ('GL_RG', GL_RG, [0, 1]),
+    ('GL_RGB', GL_RGB, [0, 1, 2]),
+    ('GL_RGBA', GL_RGBA, [0, 1, 2, 3]),
+    ('GL_BGR', GL_BGR, [2, 1, 0]),
+    ('GL_BGRA', GL_BGRA, [2, 1, 0, 3]),
+)
+
+
+def check_formats(width=37, height=21):
+    # Reads back a known clear in every format. The odd width catches row
+    # padding, the corner cleared with another color catches scrambled
+    # pixels and flipped rows.
+    framebuffer = Framebuffer(width=width, height=height, format=GL_RGBA)
+    background = np.array([0, 128, 255, 255], dtype=np.uint8)
+    corner = np.array([255, 64, 0, 128], dtype=np.uint8)
+    with framebuffer:
+        glClearColor(*(background / 255.0))
+        glClear(GL_COLOR_BUFFER_BIT)
+        glEnable(GL_SCISSOR_TEST)
+        glScissor(0, 0, width // 2, height // 2)
+        glClearColor(*(corner / 255.0))
+        glClear(GL_COLOR_BUFFER_BIT)
+        glDisable(GL_SCISSOR_TEST)
+
+    for name, format, channels in FORMAT_CHANNELS:
+        image = framebuffer.read_async(format=format).result()
+        expected = np.empty((height, width, len(channels)), dtype=np.uint8)
+        expected[:] = background[channels]
+        expected[:height // 2, :width // 2] = corner[channels]
+        assert image.shape == expected.shape, \
+            '{}: shape {} instead of {}'.format(
+                name, image.shape, expected.shape
+            )
+        assert np.array_equal(image, expected), \
+            '{}: unexpected pixels'.format(name)
+        debug('{}: {} ok'.format(name, image.shape))
+    framebuffer.release()
+
+
+def run_sync(framebuffer, renderer, frames):
+    images = []
+    start = time.perf_counter()
+    for frame in range(frames):
+        draw(framebuffer, renderer, frame)
+        glBindFramebuffer(GL_FRAMEBUFFER, framebuffer.id)
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        data = glReadPixels(
+            0, 0,
+            framebuffer.width, framebuffer.height,
+            GL_RGB,
+            GL_UNSIGNED_BYTE
+        )
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        images.append(np.frombuffer(data, dtype=np.uint8))
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000.0 / frames, images
+
+
+def run_async(framebuffer, renderer, frames, latency):
+    # Pixels of a frame are taken latency frames after it's rendered
+    images = []
+    pending = []
+    start = time.perf_counter()
+    for frame in range(frames):
+        draw(framebuffer, renderer, frame)
+        pending.append(framebuffer.read_async())
+        if len(pending) > latency:
+            images.append(pending.pop(0).result().reshape(-1))
+    for readback in pending:
+        images.append(readback.result().reshape(-1))
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000.0 / frames, images
+
+
+def main():
+    global verbose
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        default=False,
+        help='Print debug string'
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        nargs=2,
+        default=[1280, 720],
+        help='Framebuffer width and height'
+    )
+    parser.add_argument(
+        '--frames', '-f',
+        type=int,
+        default=100,
+        help='Frame count per mode'
+    )
+    parser.add_argument(
+        '--buffers', '-b',
+        type=int,
+        default=3,
+        help='Pixel pack buffers of the readback ring'
+    )
+
+    args = parser.parse_args()
+    verbose = args.verbose
+
+    create_context()
+    check_formats()
+    print('readback of {} formats checked'.format(len(FORMAT_CHANNELS)))
+
+    renderer = TriangleRenderer()
+    renderer.prepare()
+    framebuffer = Framebuffer(
+        width=args.size[0],
+        height=args.size[1],
+        readback_buffers=args.buffers
+    )
+
+    sync_ms, sync_images = run_sync(framebuffer, renderer, args.frames)
+    async_ms, async_images = run_async(
+        framebuffer, renderer, args.frames, args.buffers - 1
+    )
+    matched = all(
+        np.array_equal(a, b) for a, b in zip(sync_images, async_images)
+    )
+
+    print('{}x{}, {} frames'.format(args.size[0], args.size[1], args.frames))
+    print('glReadPixels:           {:8.3f} ms/frame'.format(sync_ms))
+    print('read_async ({} buffers): {:8.3f} ms/frame'.format(
+        args.buffers, async_ms
+    ))
+    print('identical pixels: {}'.format(matched))
+
+
+if __name__ == '__main__':
+    main()
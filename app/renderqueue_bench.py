@@ -0,0 +1,265 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from pyglfw.headless import create_context
+
+from OpenGL.GL import *
+
+from pyglfw.camera import load_camera
+from pyglfw.fbo import Framebuffer
+from pyglfw.instance import ModelInstance
+from pyglfw.light import load_light
+from pyglfw.model import load_fromjson
+from pyglfw.profiler import Profiler
+from pyglfw.renderqueue import RenderQueue
+from pyglfw.scene import Scene
+from pyglfw.scene import load_fromjson as load_scene
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+BIND_FUNCTIONS = (
+    'glUseProgram',
+    'glBindVertexArray',
+    'glBindBuffer',
+    'glActiveTexture',
+    'glBindTexture',
+    'glPointSize',
+    'glGetIntegerv',
+)
+
+
+def mixed_scene(resdir, instances, materials, instanced=False, seed=0):
+    # Color cubes and containers with 'materials' distinct materials (each
+    # with its own textures and vertex array), interleaved so that
+    # consecutive instances never share a material
+    models = [load_fromjson(os.path.join(resdir, 'cubic.json'))]
+    for i in range(materials):
+        model = load_fromjson(os.path.join(resdir, 'model_container.json'))
+        model.name = 'container{}'.format(i)
+        model.material.shininess = 2.0 ** i
+        models.append(model)
+
+    rng = np.random.default_rng(seed)
+    columns = max(int(np.ceil(np.sqrt(instances))), 1)
+    spacing = 2.0 / columns
+    instance_list = {}
+    for i in range(instances):
+        model = models[i % len(models)]
+        name = 'instance{}'.format(i)
+        instance_list[name] = ModelInstance(
+            name=name,
+            model=model,
+            renderer_spec={
+                'class': 'InstanceRenderer',
+                'params': {
+                    'use_material': model.use_material,
+                    'instanced': instanced,
+                },
+            },
+            translation=[
+                -1.0 + spacing * (i % columns + 0.5),
+                -1.0 + spacing * (i // columns + 0.5),
+                float(rng.uniform(-2.0, 0.5)),
+            ],
+            rotation=[0.0, 0.0, 0.0],
+            scale=[spacing * 0.4] * 3,
+        )
+
+    light = load_light({
+        'name': 'pointLight',
+        'class': 'PointLight',
+        'position': [0.2, 0.0, 1.0],
+        'ambient': [0.1, 0.1, 0.1],
+        'diffuse': [1.0, 1.0, 1.0],
+        'specular': [0.0, 0.0, 0.0],
+        'constant': 1.0,
+        'linear': 0.09,
+        'quadratic': 0.032,
+    })
+    camera = load_camera({
+        'position': [0.0, 0.0, 3.0],
+        'up': [0.0, 1.0, 0.0],
+        'rotation': [-90.0, 0.0, 0.0],
+        'fov': 45.0,
+        'aspect_ratio': 1.0,
+        'near_distance': 0.1,
+        'far_distance': 100.0,
+    })
+
+    return Scene(
+        name='mixed',
+        camera=camera,
+        instances=instance_list,
+        lights=[light]
+    )
+
+
+def draw(scene, framebuffer):
+    with framebuffer:
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        scene.render()
+
+
+def run(scene, framebuffer, queue, frames):
+    scene.render_queue = queue
+
+    # GL calls are counted in a pass of its own, wrapping slows it down
+    with Profiler() as profiler:
+        profiler.begin_frame()
+        draw(scene, framebuffer)
+        report = profiler.end_frame()
+    counts = {}
+    for stats in report.passes.values():
+        debug('  {:24s} {:6d} gl calls'.format(stats.name, stats.gl_calls))
+        for name, count in stats.gl_functions.items():
+            counts[name] = counts.get(name, 0) + count
+
+    if queue is not None:
+        queue.reset_stats()
+    start = time.perf_counter()
+    for __ in range(frames):
+        draw(scene, framebuffer)
+    glFinish()
+    elapsed = (time.perf_counter() - start) * 1000.0 / frames
+
+    image = framebuffer.read_async().result()
+    return elapsed, report.gl_calls, counts, image
+
+
+def main():
+    global verbose
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        default=False,
+        help='Print debug string'
+    )
+    parser.add_argument(
+        '--resdir', '-d',
+        default='example/res',
+        help='Directory of cubic.json and model_container.json'
+    )
+    parser.add_argument(
+        '--scene', '-s',
+        default=None,
+        help='Scene json to render instead of the mixed scene'
+    )
+    parser.add_argument(
+        '--instances', '-n',
+        type=int,
+        default=200,
+        help='Instance count'
+    )
+    parser.add_argument(
+        '--materials', '-m',
+        type=int,
+        default=4,
+        help='Distinct textured materials'
+    )
+    parser.add_argument(
+        '--instanced', '-i',
+        action='store_true',
+        default=False,
+        help='Draw instances sharing a model with one draw call'
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        nargs=2,
+        default=[640, 640],
+        help='Framebuffer width and height'
+    )
+    parser.add_argument(
+        '--frames', '-f',
+        type=int,
+        default=50,
+        help='Timed frame count per mode'
+    )
+
+    args = parser.parse_args()
+    verbose = args.verbose
+
+    create_context()
+
+    if args.scene is not None:
+        scene = load_scene(args.scene)
+    else:
+        scene = mixed_scene(
+            args.resdir,
+            args.instances,
+            args.materials,
+            instanced=args.instanced
+        )
+    framebuffer = Framebuffer(width=args.size[0], height=args.size[1])
+    scene.prepare()
+    with framebuffer:
+        scene.reshape(*args.size)
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_CULL_FACE)
+
+    modes = (
+        ('unsorted', None),
+        ('sorted', RenderQueue()),
+        ('front to back', RenderQueue(front_to_back=True)),
+    )
+    results = []
+    for name, queue in modes:
+        results.append((name, queue) + run(
+            scene, framebuffer, queue, args.frames
+        ))
+
+    if args.scene is not None:
+        print(args.scene)
+    else:
+        print('{} instances, {} materials{}'.format(
+            args.instances, args.materials,
+            ('', ', instanced')[args.instanced]
+        ))
+    header = '{:18s}'.format('') + ''.join(
+        '{:>15s}'.format(name) for name, *__ in results
+    )
+    print(header)
+    print('{:18s}'.format('ms/frame') + ''.join(
+        '{:15.3f}'.format(r[2]) for r in results
+    ))
+    print('{:18s}'.format('GL calls/frame') + ''.join(
+        '{:15d}'.format(r[3]) for r in results
+    ))
+    for function in BIND_FUNCTIONS:
+        print('{:18s}'.format(function) + ''.join(
+            '{:15d}'.format(r[4].get(function, 0)) for r in results
+        ))
+
+    # Pixels differing from render_queue=None, and binds the queue issued
+    # and skipped per frame
+    reference = results[0][5]
+    differing = {}
+    for name, queue, __, __, __, image in results[1:]:
+        differing[name] = np.count_nonzero(
+            np.any(reference != image, axis=-1)
+        )
+        print('{}: {} differing pixels'.format(name, differing[name]))
+        for kind, count in queue.binds.items():
+            debug('  {:16s} {:8.1f} bound {:8.1f} skipped'.format(
+                kind,
+                count / args.frames,
+                queue.skipped_binds[kind] / args.frames
+            ))
+
+    assert not any(differing.values()), 'queue changes rendered pixels'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import time
+
+import numpy as np
+
+# Selects a headless GL platform, so it's imported before OpenGL
+from pyglfw.headless import create_context
+
+from OpenGL.GL import *
+
+from pyglfw.fbo import Framebuffer
+from pyglfw.framework import Program
+from pyglfw.framework import VertexObject
+from pyglfw.renderer import Renderer
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+USAGES = {
+    'static': GL_STATIC_DRAW,
+    'dynamic': GL_DYNAMIC_DRAW,
+    'stream': GL_STREAM_DRAW,
+}
+
+
+def run_mode(mode, program, framebuffer, vertex_count, frames, resize_every):
+    alignment = [3, 3]
+    vertexobj = None
+    recreated = 0
+    rng = np.random.default_rng(0)
+
+    # Landmark-like workload: every frame rewrites all vertices and
+    # the vertex count changes once in a while
+    start = time.perf_counter()
+    for frame in range(frames):
+        count = vertex_count
+        if resize_every > 0:
+            count += (frame // resize_every) % 4
+        v = rng.random((count, 6), dtype=np.float32)
+
+        if vertexobj is None or not vertexobj.update(v):
+            vertexobj = VertexObject(v, alignment, usage=USAGES[mode])
+            recreated += 1
+
+        with framebuffer:
+            with program:
+                with vertexobj as vo:
+                    glDrawArrays(GL_POINTS, 0, vo.vertex_count)
+        glFinish()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'mode': mode,
+        'frame_ms': elapsed * 1000.0 / frames,
+        'recreated': recreated,
+    }
+
+
+def main():
+    global verbose
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        default=False,
+        help='Print debug string'
+    )
+    parser.add_argument(
+        '--vertices', '-n',
+        type=int,
+        default=68,
+        help='Vertex count per update'
+    )
+    parser.add_argument(
+        '--frames', '-f',
+        type=int,
+        default=500,
+        help='Frame count per mode'
+    )
+    parser.add_argument(
+        '--resize-every', '-r',
+        type=int,
+        default=50,
+        help='Change vertex count every N frames (0 to disable)'
+    )
+
+    args = parser.parse_args()
+    verbose = args.verbose
+
+    create_context()
+
+    with open(Renderer.default_vs_path) as f:
+        vs_code = f.read()
+    with open(Renderer.default_fs_path) as f:
+        fs_code = f.read()
+    program = Program(vs_code, fs_code)
+    framebuffer = Framebuffer(width=256, height=256)
+
+    for mode in USAGES:
+        result = run_mode(
+            mode,
+            program,
+            framebuffer,
+            args.vertices,
+            args.frames,
+            args.resize_every
+        )
+        print('{mode:>8}: {frame_ms:8.3f} ms/frame, '
+              '{recreated} vertex object(s) created'.format(**result))
+
+
+if __name__ == '__main__':
+    main()
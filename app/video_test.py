@@ -4,6 +4,7 @@ import sys
 
 from PyQt5.QtCore import pyqtProperty
 from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtCore import Qt
 from PyQt5.QtCore import QUrl
 from PyQt5.QtGui import QGuiApplication
 from PyQt5.QtQuick import QQuickView
@@ -18,19 +19,31 @@ from pyqt5glfw.qquickglitem import QQuickGLItem
 
 class VideoView(QQuickGLItem):
 
-    requestUpdate = pyqtSignal()
+    playChanged = pyqtSignal()
+    positionChanged = pyqtSignal()
+    rateChanged = pyqtSignal()
+    durationChanged = pyqtSignal()
+    # Emitted on frames, seeks, opens and the end of the stream, from the
+    # player's threads
+    playerStateChanged = pyqtSignal()
 
     def __init__(self, parent=None, play=False):
         super(VideoView, self).__init__(parent=parent)
 
         self._play = False
         self._videoSource = None
+        self._position = 0.0
+        self._duration = 0.0
         self.player = VideoPlayer()
-
-        video = VideoRenderer(
-            video_source=self.player,
-            frame_block=self._update_frame
+        # Queued like frameAvailable, properties are read on the GUI thread
+        self.playerStateChanged.connect(
+            self._onPlayerStateChanged,
+            type=Qt.QueuedConnection
         )
+        self.player.add_listener(self._onPlayerEvent)
+        self.player.add_end_listener(self._onPlayerEvent)
+
+        video = VideoRenderer(video_source=self.player)
         # flip = FlipRenderer(
         #     width=self.player.width,
         #     height=self.player.height,
@@ -43,14 +56,14 @@ class VideoView(QQuickGLItem):
         )
 
         self.renderer = video
+        # Repaints only when the player has a new frame
+        self.watch_source(self.player)
         self.play = play
 
-        self.requestUpdate.connect(self._requestUpdate)
-
     def __del__(self):
-        self.play = False
+        self.player.stop()
 
-    @pyqtProperty(bool)
+    @pyqtProperty(bool, notify=playChanged)
     def play(self):
         return self._play
 
@@ -62,6 +75,7 @@ class VideoView(QQuickGLItem):
                 self.player.start()
             else:
                 self.player.stop()
+            self.playChanged.emit()
 
     @pyqtProperty(str)
     def videoSource(self):
@@ -72,18 +86,52 @@ class VideoView(QQuickGLItem):
         if self.videoSource != value:
             self.player.srcpath = value
 
+    @pyqtProperty(float, notify=positionChanged)
+    def position(self):
+        return self.player.position
+
+    @position.setter
+    def position(self, value):
+        self.player.seek(value)
+
+    @pyqtProperty(float, notify=rateChanged)
+    def rate(self):
+        return self.player.rate
+
+    @rate.setter
+    def rate(self, value):
+        if self.player.rate != value:
+            self.player.rate = value
+            self.rateChanged.emit()
+
+    @pyqtProperty(float, notify=durationChanged)
+    def duration(self):
+        return self.player.duration
+
+    def _onPlayerEvent(self, sequence=None):
+        self.playerStateChanged.emit()
+
+    def _onPlayerStateChanged(self):
+        position = self.player.position
+        if self._position != position:
+            self._position = position
+            self.positionChanged.emit()
+
+        duration = self.player.duration
+        if self._duration != duration:
+            self._duration = duration
+            self.durationChanged.emit()
+
+        # The player stops itself at the end of the stream
+        if self._play and not self.player.run:
+            self._play = False
+            self.playChanged.emit()
+
     # TODO: Add about resume
     def _onInvalidateUnderlay(self):
         super(VideoView, self)._onInvalidateUnderlay()
         self.play = False
 
-    def _update_frame(self, image):
-        self.requestUpdate.emit()
-        return image
-
-    def _requestUpdate(self):
-        self.update()
-
 
 def run_qml(qmlpath):
     app = QGuiApplication(sys.argv)
@@ -0,0 +1,156 @@
+import argparse
+import time
+
+import numpy as np
+
+from pyglfw.headless import create_context
+
+from OpenGL.GL import *
+
+from pyglfw.fbo import Framebuffer
+from pyglfw.video import FrameSource
+from pyglfw.video import VideoRenderer
+from pyglfw.video import VideoWallRenderer
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+class SyntheticSource(FrameSource):
+
+    # Cycles through pregenerated BGR frames, a new frame per tick
+    def __init__(self, width, height, seed=0):
+        super().__init__()
+        rng = np.random.default_rng(seed)
+        self._frames = [
+            rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+            for __ in range(4)
+        ]
+        self._sequence = 0
+
+    def rewind(self):
+        self._sequence = 0
+
+    def tick(self):
+        self._sequence += 1
+        self._notify(self._sequence)
+
+    def read(self):
+        return self._sequence, self._frames[self._sequence % 4]
+
+    @property
+    def frame(self):
+        return self.read()[1]
+
+
+def run(renderers, sources, framebuffer, frames):
+    # Every mode shows the same frames
+    for source in sources:
+        source.rewind()
+
+    start = time.perf_counter()
+    for __ in range(frames):
+        for source in sources:
+            source.tick()
+        with framebuffer:
+            glClear(GL_COLOR_BUFFER_BIT)
+            for renderer, viewport in renderers:
+                if viewport is not None:
+                    glViewport(*viewport)
+                renderer.render()
+        glFinish()
+    elapsed = (time.perf_counter() - start) * 1000.0 / frames
+
+    image = framebuffer.read_async().result()
+    return elapsed, image
+
+
+def main():
+    global verbose
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        default=False,
+        help='Print debug string'
+    )
+    parser.add_argument(
+        '--streams', '-n',
+        type=int,
+        default=16,
+        help='Number of video streams'
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        nargs=2,
+        default=[320, 240],
+        help='Frame width and height'
+    )
+    parser.add_argument(
+        '--frames', '-f',
+        type=int,
+        default=100,
+        help='Frame count per mode'
+    )
+
+    args = parser.parse_args()
+    verbose = args.verbose
+    width, height = args.size
+
+    create_context()
+
+    sources = [
+        SyntheticSource(width, height, seed=i) for i in range(args.streams)
+    ]
+    wall = VideoWallRenderer(
+        sources=sources,
+        tile_width=width,
+        tile_height=height
+    )
+    wall.prepare()
+
+    columns, rows = wall.grid
+    framebuffer = Framebuffer(width=columns * width, height=rows * height)
+
+    # One renderer and one pass per stream, laid out on the same grid
+    singles = []
+    for source, (x, y, w, h) in zip(sources, wall.layout):
+        renderer = VideoRenderer(video_source=source)
+        renderer.prepare()
+        viewport = (
+            int(x * columns * width),
+            int((1.0 - y - h) * rows * height),
+            width,
+            height
+        )
+        singles.append((renderer, viewport))
+
+    full = (0, 0, columns * width, rows * height)
+    single_ms, single_image = run(
+        singles, sources, framebuffer, args.frames
+    )
+    wall_ms, wall_image = run(
+        [(wall, full)], sources, framebuffer, args.frames
+    )
+    differing = np.count_nonzero(np.any(single_image != wall_image, axis=-1))
+
+    print('{} streams of {}x{}'.format(args.streams, width, height))
+    print('renderer per stream: {:8.3f} ms/frame'.format(single_ms))
+    print('video wall:          {:8.3f} ms/frame'.format(wall_ms))
+    print('differing pixels:    {:8d}'.format(differing))
+    for i, stat in enumerate(wall.stats):
+        debug('stream {:2d}: {uploads} uploads, latency {latency:.6f} s'
+              .format(i, **stat))
+
+    assert differing == 0, 'video wall differs from renderer per stream'
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,6 @@ import numpy as np
 import sys
 
 from PyQt5.QtCore import pyqtProperty
-from PyQt5.QtCore import pyqtSignal
 from PyQt5.QtCore import QUrl
 from PyQt5.QtGui import QGuiApplication
 from PyQt5.QtQuick import QQuickView
@@ -18,8 +17,6 @@ from pyqt5glfw.qquickglitem import QQuickGLItem
 
 class VideoView(QQuickGLItem):
 
-    requestUpdate = pyqtSignal()
-
     def __init__(self, parent=None, play=False):
         super(VideoView, self).__init__(parent=parent)
 
@@ -27,10 +24,7 @@ class VideoView(QQuickGLItem):
         self._videoSource = None
         self.player = Webcam()
 
-        video = VideoRenderer(
-            video_source=self.player,
-            frame_block=self._update_frame
-        )
+        video = VideoRenderer(video_source=self.player)
         flip = FlipRenderer(
             width=self.player.width,
             height=self.player.height,
@@ -38,10 +32,10 @@ class VideoView(QQuickGLItem):
         )
 
         self.renderer = flip
+        # Repaints only when the player has a new frame
+        self.watch_source(self.player)
         self.play = play
 
-        self.requestUpdate.connect(self._requestUpdate)
-
     def __del__(self):
         self.play = False
 
@@ -63,13 +57,6 @@ class VideoView(QQuickGLItem):
         super(VideoView, self)._onInvalidateUnderlay()
         self.play = False
 
-    def _update_frame(self, image):
-        self.requestUpdate.emit()
-        return image
-
-    def _requestUpdate(self):
-        self.update()
-
 
 def run_qml(qmlpath):
     app = QGuiApplication(sys.argv)
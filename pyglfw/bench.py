@@ -0,0 +1,310 @@
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+# Selects a headless GL platform, so it's imported before OpenGL
+from .headless import create_context
+
+from OpenGL.GL import *
+
+from .fbo import Framebuffer
+from .profiler import Profiler
+from .scene import load_fromdesc
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+def synthetic_desc(instances=100, lights=1, textured=10):
+    # A grid of cubes in front of the camera, the first 'textured' ones
+    # with the material model. Shaders use one point light, the first
+    # light is that one. Extra lights get uniform names of their own,
+    # which the shaders don't declare.
+    columns = max(int(np.ceil(np.sqrt(instances))), 1)
+    spacing = 2.0 / columns
+    instance_descs = []
+    for i in range(instances):
+        x = -1.0 + spacing * (i % columns + 0.5)
+        y = -1.0 + spacing * (i // columns + 0.5)
+        instance_descs.append({
+            'name': 'instance{}'.format(i),
+            'model': ('cubic', 'container')[i < textured],
+            'renderer': 'InstanceRenderer',
+            'translation': [x, y, 0.0],
+            'rotation': [0.0, 0.0, 0.0],
+            'scale': [spacing * 0.4] * 3,
+        })
+
+    light_descs = []
+    for i in range(lights):
+        light_descs.append({
+            'name': ('pointLight{}'.format(i), 'pointLight')[i == 0],
+            'class': 'PointLight',
+            'position': [0.2, 0.0, 1.0 + 0.1 * i],
+            'ambient': [0.1, 0.1, 0.1],
+            'diffuse': [1.0, 1.0, 1.0],
+            'specular': [0.0, 0.0, 0.0],
+            'constant': 1.0,
+            'linear': 0.09,
+            'quadratic': 0.032,
+        })
+
+    return {
+        'name': 'synthetic',
+        'resources': [
+            {'type': 'model', 'filepath': './cubic.json'},
+            {'type': 'model', 'filepath': './model_container.json'},
+        ],
+        'lights': light_descs,
+        'instances': instance_descs,
+        'camera': {
+            'position': [0.0, 0.0, 3.0],
+            'up': [0.0, 1.0, 0.0],
+            'rotation': [-90.0, 0.0, 0.0],
+            'fov': 45.0,
+            'aspect_ratio': 1.0,
+            'near_distance': 0.1,
+            'far_distance': 100.0,
+        },
+    }
+
+
+def _animate(scene, frame):
+    # Per-frame update of the scene, every instance is spun a bit
+    angle = frame * 0.01
+    for instance in scene.instances.values():
+        instance.rotation = (angle, angle * 0.5, 0.0)
+
+
+def _render_frame(scene, framebuffer, frame):
+    # Returns CPU seconds of update, draw and finish
+    with framebuffer:
+        start = time.perf_counter()
+        _animate(scene, frame)
+        updated = time.perf_counter()
+
+        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+        scene.render()
+        drawn = time.perf_counter()
+
+        glFinish()
+        finished = time.perf_counter()
+
+    return updated - start, drawn - updated, finished - drawn
+
+
+def _percentiles(values_ms):
+    values = np.asarray(values_ms)
+    return {
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max()),
+    }
+
+
+def run(scene, width=640, height=480, frames=200, warmup=10):
+    # Timings and counts are means over frames
+    if frames < 1:
+        raise ValueError('frames should be at least 1')
+
+    framebuffer = Framebuffer(width=width, height=height)
+
+    start = time.perf_counter()
+    scene.prepare()
+    prepare_ms = (time.perf_counter() - start) * 1000.0
+    with framebuffer:
+        scene.reshape(width, height)
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_CULL_FACE)
+
+    for frame in range(warmup):
+        _render_frame(scene, framebuffer, frame)
+
+    phases = []
+    for frame in range(frames):
+        phases.append(_render_frame(scene, framebuffer, warmup + frame))
+    phases = np.array(phases) * 1000.0
+
+    # Counting and allocation tracing slow rendering down, so they are
+    # measured in passes of their own
+    counting_frames = min(frames, 10)
+    gl_functions = {}
+    passes = {}
+    with Profiler(gpu_timing=True) as profiler:
+        for frame in range(counting_frames):
+            profiler.begin_frame()
+            _render_frame(scene, framebuffer, frame)
+            profiler.end_frame()
+
+    # Leaving the profiler has read back the GPU times of every frame
+    for report in profiler.reports:
+        for stats in report.passes.values():
+            for name, count in stats.gl_functions.items():
+                gl_functions[name] = gl_functions.get(name, 0) + count
+            totals = passes.setdefault(stats.name, np.zeros(4))
+            totals += (
+                stats.cpu_time * 1000.0,
+                (stats.gpu_time or 0.0) * 1000.0,
+                stats.gl_calls,
+                stats.uploaded_bytes
+            )
+
+    allocations = []
+    tracemalloc.start()
+    for frame in range(counting_frames):
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        _render_frame(scene, framebuffer, frame)
+        allocations.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    framebuffer.release()
+
+    return {
+        'scene': scene.name,
+        'gl_renderer': glGetString(GL_RENDERER).decode(),
+        'size': [width, height],
+        'frames': frames,
+        'instances': len(scene.instances),
+        'lights': len(scene.lights),
+        'load_ms': {
+            key: value * 1000.0 for key, value in scene.timings.items()
+            if key != 'prepare'
+        },
+        'prepare_ms': prepare_ms,
+        'cpu_ms': {
+            'update': float(phases[:, 0].mean()),
+            'draw': float(phases[:, 1].mean()),
+            'finish': float(phases[:, 2].mean()),
+        },
+        'frame_ms': _percentiles(phases.sum(axis=1)),
+        'gl_calls_per_frame': sum(gl_functions.values()) / counting_frames,
+        'gl_calls': {
+            name: count / counting_frames
+            for name, count in sorted(gl_functions.items())
+        },
+        # Means of the instrumented frames, cpu_ms is slowed down by the
+        # instrumentation and only comparable between passes. gpu_ms comes
+        # from timer queries, software GL may do the work at glFinish.
+        'passes': {
+            name: {
+                'cpu_ms': float(totals[0] / counting_frames),
+                'gpu_ms': float(totals[1] / counting_frames),
+                'gl_calls': float(totals[2] / counting_frames),
+                'uploaded_bytes': float(totals[3] / counting_frames),
+            }
+            for name, totals in sorted(passes.items())
+        },
+        'alloc_bytes_per_frame': {
+            'mean': float(np.mean(allocations)),
+            'max': int(np.max(allocations)),
+        },
+    }
+
+
+def main():
+    global verbose
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        default=False,
+        help='Print debug string'
+    )
+    parser.add_argument(
+        '--scene', '-s',
+        default=None,
+        help='Scene JSON file path, a synthetic scene if not given'
+    )
+    parser.add_argument(
+        '--resdir', '-d',
+        default='example/res',
+        help='Directory of models of the synthetic scene'
+    )
+    parser.add_argument(
+        '--instances', '-n',
+        type=int,
+        default=100,
+        help='Instance count of the synthetic scene'
+    )
+    parser.add_argument(
+        '--lights', '-l',
+        type=int,
+        default=1,
+        help='Light count of the synthetic scene'
+    )
+    parser.add_argument(
+        '--textured', '-t',
+        type=int,
+        default=10,
+        help='Instances of the textured model in the synthetic scene'
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        nargs=2,
+        default=[640, 480],
+        help='Framebuffer width and height'
+    )
+    parser.add_argument(
+        '--frames', '-f',
+        type=int,
+        default=200,
+        help='Measured frame count'
+    )
+    parser.add_argument(
+        '--output', '-o',
+        default=None,
+        help='JSON output file path, stdout if not given'
+    )
+
+    args = parser.parse_args()
+    verbose = args.verbose
+
+    context = create_context()
+
+    if args.scene is not None:
+        with open(args.scene) as f:
+            desc = json.load(f)
+        basepath = os.path.dirname(args.scene)
+    else:
+        desc = synthetic_desc(
+            instances=args.instances,
+            lights=args.lights,
+            textured=args.textured
+        )
+        basepath = args.resdir
+    scene = load_fromdesc(desc, basepath)
+
+    result = run(
+        scene,
+        width=args.size[0],
+        height=args.size[1],
+        frames=args.frames
+    )
+    scene.dispose()
+    context.release()
+
+    output = json.dumps(result, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        debug(output)
+
+
+if __name__ == '__main__':
+    main()
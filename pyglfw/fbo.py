@@ -1,21 +1,68 @@
+import ctypes
 import numpy as np
 
+from collections import OrderedDict
 from OpenGL.GL import *
 
+from .framework import INTERNAL_FORMATS
 from .framework import Texture
 
 
+# Bytes per pixel of color texture formats
+PIXEL_SIZES = {
+    GL_RED: 1,
+    GL_RG: 2,
+    GL_RGB: 3,
+    GL_RGBA: 4,
+    GL_BGR: 3,
+    GL_BGRA: 4,
+}
+
+
+def pixel_size(format):
+    if format not in PIXEL_SIZES:
+        raise ValueError('Unsupported pixel format {}'.format(format))
+    return PIXEL_SIZES[format]
+
+
 class Framebuffer:
 
-    def __init__(self, width, height):
-        self._id = -1
-        self._rbo_id = -1
+    # bucket: storage is rounded up to multiples of bucket pixels, so that
+    #         small resizes reuse it. Only width x height of the texture
+    #         is rendered then, see texcoord_scale.
+    # depth_stencil: attaches a depth and stencil renderbuffer
+    # format: pixel format of the color texture
+    # samples: renders into multisample renderbuffers if more than 0,
+    #          they are resolved into the texture on exit
+    # readback_buffers: pixel pack buffers pipelining read_async
+    def __init__(
+            self,
+            width, height,
+            bucket=0,
+            depth_stencil=True,
+            format=GL_RGB,
+            samples=0,
+            readback_buffers=3):
+        self._id = 0
+        self._rbo_id = 0
+        self._msaa_id = 0
+        self._msaa_color_id = 0
+        self._texture = None
         self._valid = False
         self._prev_viewport = (0, 0, 1, 1)
         self._prev_fbo_id = -1
 
         self._width = 0
         self._height = 0
+        self._storage_width = 0
+        self._storage_height = 0
+        self._bucket = bucket
+        self._depth_stencil = depth_stencil
+        self._samples = samples
+        self._readback_buffers = readback_buffers
+        self._pbos = []
+        self._readbacks = []
+        self._readback_index = 0
 
         self._pending_width = -1
         self._pending_height = -1
@@ -23,7 +70,9 @@ class Framebuffer:
         self._attachment = GL_COLOR_ATTACHMENT0
         self._bind_point = GL_FRAMEBUFFER
 
-        self._texformat = GL_RGB
+        # Raises ValueError early for formats which can't be sized
+        pixel_size(format)
+        self._texformat = format
         self._textarget = GL_TEXTURE_2D
 
         self.width = width
@@ -33,7 +82,33 @@ class Framebuffer:
         self._setup_framebuffer()
 
     def __del__(self):
-        glDeleteFramebuffers(1, np.array([self.id]))
+        self.release()
+
+    # Frees GL objects now instead of waiting for garbage collection
+    def release(self):
+        if self._id:
+            glDeleteFramebuffers(1, np.array([self._id]))
+        if self._rbo_id:
+            glDeleteRenderbuffers(1, np.array([self._rbo_id]))
+        if self._msaa_id:
+            glDeleteFramebuffers(1, np.array([self._msaa_id]))
+        if self._msaa_color_id:
+            glDeleteRenderbuffers(1, np.array([self._msaa_color_id]))
+        if self._texture is not None:
+            self._texture.release()
+        for handle in self._readbacks:
+            if handle is not None:
+                handle.cancel()
+        if self._pbos:
+            glDeleteBuffers(len(self._pbos), np.array(self._pbos))
+        self._pbos = []
+        self._readbacks = []
+        self._id = 0
+        self._rbo_id = 0
+        self._msaa_id = 0
+        self._msaa_color_id = 0
+        self._texture = None
+        self._valid = False
 
     def __enter__(self):
         if (self.width <= 0 or self.height <= 0) and \
@@ -42,13 +117,15 @@ class Framebuffer:
 
         self._prev_viewport = glGetIntegerv(GL_VIEWPORT)
         self._prev_fbo_id = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
-        glBindFramebuffer(self._bind_point, self.id)
+        glBindFramebuffer(self._bind_point, self.draw_id)
         self._update_size()
         glViewport(0, 0, self.width, self.height)
 
         return self
 
     def __exit__(self, exc_type, exc_value, tb):
+        if self._msaa_id:
+            self.resolve()
         glBindFramebuffer(self._bind_point, self._prev_fbo_id)
         glViewport(
             self._prev_viewport[0],
@@ -61,29 +138,26 @@ class Framebuffer:
         tex_desc = {
             'target': self._textarget,
             'unit': GL_TEXTURE0,
-            'width': self.width,
-            'height': self.height,
+            'format': self._texformat,
         }
         self._texture = Texture(**tex_desc)
 
     def _setup_framebuffer(self):
         self._prev_fbo_id = glGetIntegerv(GL_FRAMEBUFFER_BINDING)
         self._id = glGenFramebuffers(1)
-        glBindFramebuffer(self._bind_point, self.id)
-
-        glFramebufferTexture2D(
-            self._bind_point,
-            self._attachment,
-            self._textarget,
-            self._texture.id,
-            0
-        )
-
-        status = glCheckFramebufferStatus(self._bind_point)
-        self._valid = status == GL_FRAMEBUFFER_COMPLETE
-        if not self._valid:
-            print('Framebuffer Error: FBO is not complete!')
-
+        if self._depth_stencil:
+            self._rbo_id = glGenRenderbuffers(1)
+        if self._samples > 0:
+            self._samples = min(
+                self._samples,
+                int(glGetIntegerv(GL_MAX_SAMPLES))
+            )
+            self._msaa_id = glGenFramebuffers(1)
+            self._msaa_color_id = glGenRenderbuffers(1)
+
+        glBindFramebuffer(self._bind_point, self.draw_id)
+        # The size is known at construction, so storage is made right away
+        self._update_size()
         glBindFramebuffer(self._bind_point, self._prev_fbo_id)
 
     def _check_pending_size(self):
@@ -92,15 +166,42 @@ class Framebuffer:
 
         return True
 
+    def _bucketed(self, size):
+        if self._bucket <= 0:
+            return size
+        return (size + self._bucket - 1) // self._bucket * self._bucket
+
     def _update_size(self):
         # This method is needed to be called with fbo binding
         if not self._check_pending_size():
             return
 
-        self._width = self._pending_width
-        self._height = self._pending_height
+        if self._pending_width >= 0:
+            self._width = self._pending_width
+        if self._pending_height >= 0:
+            self._height = self._pending_height
+        self._pending_width = self._pending_height = -1
 
-        self._setup_texture()
+        storage_width = self._bucketed(self._width)
+        storage_height = self._bucketed(self._height)
+        if storage_width == self._storage_width and \
+           storage_height == self._storage_height:
+            return
+        if storage_width <= 0 or storage_height <= 0:
+            return
+
+        self._storage_width = storage_width
+        self._storage_height = storage_height
+        self._resize_storage()
+
+    def _resize_storage(self):
+        # Storage of the same texture and renderbuffers is respecified,
+        # the texture may get a new id if its storage is immutable
+        self._texture.update(
+            width=self._storage_width,
+            height=self._storage_height
+        )
+        glBindFramebuffer(self._bind_point, self._id)
         glFramebufferTexture2D(
             self._bind_point,
             self._attachment,
@@ -108,8 +209,101 @@ class Framebuffer:
             self._texture.id,
             0
         )
+        resolvable = True
+        if self._msaa_id:
+            # Multisample framebuffer owns color and depth, the texture is
+            # only a resolve target then
+            resolvable = self._check_status()
+            glBindFramebuffer(self._bind_point, self._msaa_id)
+            self._attach_renderbuffer(
+                self._msaa_color_id,
+                INTERNAL_FORMATS.get(self._texformat, self._texformat),
+                self._attachment
+            )
+
+        if self._rbo_id:
+            self._attach_renderbuffer(
+                self._rbo_id,
+                GL_DEPTH24_STENCIL8,
+                GL_DEPTH_STENCIL_ATTACHMENT
+            )
+
+        self._valid = resolvable and self._check_status()
+        glBindFramebuffer(self._bind_point, self.draw_id)
+
+    def _attach_renderbuffer(self, rbo_id, internal_format, attachment):
+        glBindRenderbuffer(GL_RENDERBUFFER, rbo_id)
+        if self._samples > 0:
+            glRenderbufferStorageMultisample(
+                GL_RENDERBUFFER,
+                self._samples,
+                internal_format,
+                self._storage_width,
+                self._storage_height
+            )
+        else:
+            glRenderbufferStorage(
+                GL_RENDERBUFFER,
+                internal_format,
+                self._storage_width,
+                self._storage_height
+            )
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        glFramebufferRenderbuffer(
+            self._bind_point,
+            attachment,
+            GL_RENDERBUFFER,
+            rbo_id
+        )
 
-        self._pending_width = self._pending_height = -1
+    def _check_status(self):
+        status = glCheckFramebufferStatus(self._bind_point)
+        if status != GL_FRAMEBUFFER_COMPLETE:
+            print('Framebuffer Error: FBO is not complete!')
+            return False
+        return True
+
+    # Resolves multisample color into the texture, called on exit
+    def resolve(self):
+        if not self._msaa_id:
+            return
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self._msaa_id)
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self._id)
+        glBlitFramebuffer(
+            0, 0, self.width, self.height,
+            0, 0, self.width, self.height,
+            GL_COLOR_BUFFER_BIT,
+            GL_NEAREST
+        )
+        glBindFramebuffer(self._bind_point, self.draw_id)
+
+    # Starts reading the color texture back without waiting for the GPU,
+    # the returned Readback gives the pixels once a fence has signaled
+    def read_async(self, format=GL_RGB):
+        if not self._pbos:
+            for i in range(max(self._readback_buffers, 1)):
+                self._pbos.append(glGenBuffers(1))
+            self._readbacks = [None] * len(self._pbos)
+
+        index = self._readback_index
+        self._readback_index = (index + 1) % len(self._pbos)
+        # A buffer still owned by an old readback is drained into it first
+        pending = self._readbacks[index]
+        if pending is not None and not pending.done:
+            pending.result()
+
+        readback = Readback(
+            self._pbos[index],
+            self.width, self.height,
+            format
+        )
+        prev_read_fbo = glGetIntegerv(GL_READ_FRAMEBUFFER_BINDING)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self._id)
+        readback.start()
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, prev_read_fbo)
+
+        self._readbacks[index] = readback
+        return readback
 
     @property
     def id(self):
@@ -120,6 +314,15 @@ class Framebuffer:
         # id is a read-only property
         raise AttributeError
 
+    @property
+    def draw_id(self):
+        # Framebuffer rendered into, the multisample one if it's enabled
+        return self._msaa_id or self._id
+
+    @property
+    def samples(self):
+        return self._samples
+
     @property
     def width(self):
         return self._width
@@ -136,6 +339,48 @@ class Framebuffer:
     def height(self, value):
         self._pending_height = int(value)
 
+    @property
+    def storage_width(self):
+        return self._storage_width
+
+    @property
+    def storage_height(self):
+        return self._storage_height
+
+    @property
+    def texcoord_scale(self):
+        # Texture coordinates of the rendered area in bucketed storage
+        if self._storage_width <= 0 or self._storage_height <= 0:
+            return (1.0, 1.0)
+        return (
+            self._width / self._storage_width,
+            self._height / self._storage_height
+        )
+
+    @property
+    def format(self):
+        return self._texformat
+
+    @property
+    def depth_stencil(self):
+        return self._depth_stencil
+
+    @property
+    def resident_bytes(self):
+        # Estimated GPU memory of the attachments
+        pixels = self._storage_width * self._storage_height
+        color_size = pixels * pixel_size(self._texformat)
+        size = color_size
+        if self._msaa_color_id:
+            size += color_size * self._samples
+        if self._rbo_id:
+            size += pixels * 4 * max(self._samples, 1)
+        return size
+
+    @property
+    def valid(self):
+        return self._valid
+
     @property
     def texture(self):
         return self._texture
@@ -144,3 +389,209 @@ class Framebuffer:
     def texture(self, value):
         # texture is a read-only property
         raise AttributeError
+
+
+class Readback:
+
+    # Pixels read from the bound read framebuffer into a pixel pack buffer,
+    # rows are bottom to top as in OpenGL
+    def __init__(self, pbo, width, height, format=GL_RGB):
+        self._pbo = pbo
+        self._width = width
+        self._height = height
+        self._format = format
+        self._shape = (height, width, pixel_size(format))
+        self._fence = None
+        self._image = None
+
+    def start(self):
+        nbytes = int(np.prod(self._shape))
+
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self._pbo)
+        glBufferData(GL_PIXEL_PACK_BUFFER, nbytes, None, GL_STREAM_READ)
+        glReadPixels(
+            0, 0,
+            self._width, self._height,
+            self._format,
+            GL_UNSIGNED_BYTE,
+            ctypes.c_void_p(0)
+        )
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        glPixelStorei(GL_PACK_ALIGNMENT, 4)
+
+        self._fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        # Makes sure the fence reaches the GPU, polling may never flush
+        glFlush()
+
+    # True if the pixels can be taken without waiting
+    def ready(self):
+        if self._image is not None:
+            return True
+        if self._fence is None:
+            return False
+        status = glClientWaitSync(self._fence, 0, 0)
+        return status in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED)
+
+    # Returns the pixels as numpy uint8 array (height, width, channels),
+    # waiting at most timeout seconds (forever if None) for the GPU.
+    # None is returned if it's timed out.
+    def result(self, timeout=None, out=None):
+        if self._image is not None:
+            return self._image
+        if self._fence is None:
+            return None
+
+        timeout_ns = GL_TIMEOUT_IGNORED
+        if timeout is not None:
+            timeout_ns = int(timeout * 1e9)
+        status = glClientWaitSync(
+            self._fence,
+            GL_SYNC_FLUSH_COMMANDS_BIT,
+            timeout_ns
+        )
+        if status not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+            return None
+
+        image = out
+        if image is None:
+            image = np.empty(self._shape, dtype=np.uint8)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self._pbo)
+        glGetBufferSubData(GL_PIXEL_PACK_BUFFER, 0, image.nbytes, image)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+
+        glDeleteSync(self._fence)
+        self._fence = None
+        self._image = image
+        return image
+
+    # Abandons the readback, its buffer may be reused right away
+    def cancel(self):
+        if self._fence is not None:
+            glDeleteSync(self._fence)
+        self._fence = None
+
+    @property
+    def done(self):
+        # No more GPU work is owned by this readback
+        return self._fence is None
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+
+class FramebufferPool:
+
+    # Hands out framebuffers keyed by
+    # (width, height, format, depth_stencil, samples)
+    # and recycles them. Free framebuffers are evicted in LRU order when
+    # resident bytes exceed max_bytes, or when they were not used for
+    # max_idle_frames frames.
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_idle_frames=60):
+        self.max_bytes = max_bytes
+        self.max_idle_frames = max_idle_frames
+
+        # Free framebuffers, the least recently used first
+        self._free = OrderedDict()
+        self._used = {}
+        # Bytes of every framebuffer made by the pool and not evicted,
+        # counted once when it's made
+        self._sizes = {}
+        self._resident_bytes = 0
+        self._frame = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def acquire(
+            self,
+            width, height,
+            format=GL_RGB,
+            depth_stencil=True,
+            samples=0):
+        key = (int(width), int(height), format, depth_stencil, samples)
+        for fbo_id, (entry_key, framebuffer, __) in \
+                reversed(self._free.items()):
+            if entry_key == key:
+                del self._free[fbo_id]
+                self._used[fbo_id] = (key, framebuffer)
+                self._hits += 1
+                return framebuffer
+
+        self._misses += 1
+        framebuffer = Framebuffer(
+            width=key[0],
+            height=key[1],
+            depth_stencil=depth_stencil,
+            format=format,
+            samples=samples
+        )
+        self._used[framebuffer.id] = (key, framebuffer)
+        self._sizes[framebuffer.id] = framebuffer.resident_bytes
+        self._resident_bytes += self._sizes[framebuffer.id]
+        self._evict()
+        return framebuffer
+
+    # Returns a framebuffer for later acquire, its contents are kept
+    # until it's handed out again
+    def recycle(self, framebuffer):
+        entry = self._used.pop(framebuffer.id, None)
+        if entry is None:
+            return
+        self._free[framebuffer.id] = (entry[0], framebuffer, self._frame)
+        self._evict()
+
+    # Marks the end of a frame and evicts idle framebuffers
+    def next_frame(self):
+        self._frame += 1
+        for fbo_id, (__, __, frame) in list(self._free.items()):
+            if self._frame - frame > self.max_idle_frames:
+                self._remove(fbo_id)
+
+    def clear(self):
+        for fbo_id in list(self._free.keys()):
+            self._remove(fbo_id)
+
+    def _evict(self):
+        while self._free and self.resident_bytes > self.max_bytes:
+            self._remove(next(iter(self._free)))
+
+    def _remove(self, fbo_id):
+        __, framebuffer, __ = self._free.pop(fbo_id)
+        self._resident_bytes -= self._sizes.pop(fbo_id)
+        framebuffer.release()
+        self._evictions += 1
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    @property
+    def hit_rate(self):
+        total = self._hits + self._misses
+        return self._hits / total if total > 0 else 0.0
+
+    @property
+    def evictions(self):
+        return self._evictions
+
+    @property
+    def resident_bytes(self):
+        return self._resident_bytes
+
+    @property
+    def free_count(self):
+        return len(self._free)
+
+    @property
+    def used_count(self):
+        return len(self._used)
@@ -2,6 +2,7 @@ import ctypes
 import numpy as np
 import pyrr
 
+from collections import namedtuple
 from OpenGL.GL import *
 from PIL import Image
 
@@ -16,6 +17,9 @@ def debug(msg):
         print(msg)
 
 
+UniformInfo = namedtuple('UniformInfo', ['location', 'type', 'size'])
+
+
 class Program:
 
     def __init__(self, vs_code, fs_code, gs_code=None):
@@ -30,6 +34,14 @@ class Program:
         for shader in shaders:
             glDeleteShader(shader)
 
+        self._uniforms = {}
+        self._uniform_hits = 0
+        self._uniform_misses = 0
+        self._shadow = {}
+        self._uploads_issued = 0
+        self._uploads_skipped = 0
+        self._introspect_uniforms()
+
     def __del__(self):
         if self._id > 0:
             status = glGetProgramiv(self._id, GL_LINK_STATUS)
@@ -43,39 +55,151 @@ class Program:
     def __exit__(self, exc_type, exc_value, tb):
         glUseProgram(0)
 
+    def _introspect_uniforms(self):
+        # Active uniforms are fixed once the program is linked, so the
+        # locations are queried only here instead of on every setter call
+        if self._id <= 0:
+            return
+
+        count = glGetProgramiv(self._id, GL_ACTIVE_UNIFORMS)
+        for i in range(count):
+            name, size, uniform_type = glGetActiveUniform(self._id, i)
+            if isinstance(name, bytes):
+                name = name.decode()
+            location = glGetUniformLocation(self._id, name)
+            if location < 0:
+                # Uniforms in a uniform block have no location
+                continue
+
+            info = UniformInfo(location, uniform_type, size)
+            self._uniforms[name] = info
+            # Arrays are reported as 'name[0]', but may be set by 'name'
+            if name.endswith('[0]'):
+                self._uniforms[name[:-3]] = info
+
+    def _location(self, name):
+        info = self._uniforms.get(name)
+        if info is None:
+            self._uniform_misses += 1
+            return -1
+
+        self._uniform_hits += 1
+        return info.location
+
+    def _should_upload(self, location, data):
+        # Uniform values persist in the program object, so uploading a
+        # value identical to the last one is a no-op worth skipping
+        if self._shadow.get(location) == data:
+            self._uploads_skipped += 1
+            return False
+
+        self._shadow[location] = data
+        self._uploads_issued += 1
+        return True
+
     def setInt(self, name, value):
-        glUniform1i(glGetUniformLocation(self._id, name), value)
+        location = self._location(name)
+        if location < 0:
+            return
+        value = int(value)
+        if self._should_upload(location, value):
+            glUniform1i(location, value)
 
     def setFloat(self, name, value):
-        glUniform1f(glGetUniformLocation(self._id, name), value)
+        location = self._location(name)
+        if location < 0:
+            return
+        value = float(value)
+        if self._should_upload(location, value):
+            glUniform1f(location, value)
 
     def setVec3f(self, name, value):
-        count = int(value.shape[0] / 3)
-        glUniform3fv(glGetUniformLocation(self._id, name), count, value)
+        location = self._location(name)
+        if location < 0:
+            return
+        value = np.ascontiguousarray(value, dtype=np.float32)
+        if self._should_upload(location, value.tobytes()):
+            count = int(value.shape[0] / 3)
+            glUniform3fv(location, count, value)
 
     def setVec4f(self, name, value):
-        count = int(value.shape[0] / 4)
-        glUniform4fv(glGetUniformLocation(self._id, name), count, value)
+        location = self._location(name)
+        if location < 0:
+            return
+        value = np.ascontiguousarray(value, dtype=np.float32)
+        if self._should_upload(location, value.tobytes()):
+            count = int(value.shape[0] / 4)
+            glUniform4fv(location, count, value)
 
     def setMatrix4(self, name, value):
-        glUniformMatrix4fv(
-            glGetUniformLocation(self._id, name),
-            1,
-            GL_FALSE,
-            value
-        )
+        location = self._location(name)
+        if location < 0:
+            return
+        value = np.ascontiguousarray(value, dtype=np.float32)
+        if self._should_upload(location, value.tobytes()):
+            glUniformMatrix4fv(
+                location,
+                1,
+                GL_FALSE,
+                value
+            )
+
+    def has_uniform(self, name):
+        return name in self._uniforms
+
+    def invalidate_shadow(self):
+        # Needed when uniforms were changed bypassing the setters
+        self._shadow = {}
+
+    def reset_uniform_stats(self):
+        self._uniform_hits = 0
+        self._uniform_misses = 0
+        self._uploads_issued = 0
+        self._uploads_skipped = 0
+
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def uniforms(self):
+        return self._uniforms
+
+    @property
+    def uniform_hits(self):
+        return self._uniform_hits
+
+    @property
+    def uniform_misses(self):
+        return self._uniform_misses
+
+    @property
+    def uploads_issued(self):
+        return self._uploads_issued
+
+    @property
+    def uploads_skipped(self):
+        return self._uploads_skipped
 
 
 class VertexObject:
 
     # vertices: float numpy array (1d)
     # alignment: int Python array
-    # indices: uint16 numpy array
-    def __init__(self, vertices, alignment, indices=None):
+    # indices: integer numpy array
+    # usage: GL_STATIC_DRAW reallocates the buffer on every update and
+    #        refuses size changes. GL_DYNAMIC_DRAW updates in place with
+    #        glBufferSubData and GL_STREAM_DRAW orphans the storage before
+    #        every full rewrite. Both of them grow capacity by doubling.
+    def __init__(self, vertices, alignment, indices=None,
+                 usage=GL_STATIC_DRAW):
         self._vbo = 0
         self._vao = 0
         self._prev_vao = 0
         self._index_object = None
+        # Serial of the InstanceMatrixBuffer instance attributes point to
+        self._instance_buffer = 0
+        self._usage = usage
 
         total = 0
         for part in alignment:
@@ -88,8 +212,10 @@ class VertexObject:
 
         self._size = vertices.size
         self._stride = total
+        self._alignment = list(alignment)
         self._attribute_count = len(alignment)
         self._vertex_count = int(vertices.size / self._stride)
+        self._capacity = vertices.nbytes
 
         self._vao = glGenVertexArrays(1)
         with self:
@@ -98,7 +224,7 @@ class VertexObject:
             glBufferData(
                 GL_ARRAY_BUFFER,
                 vertices,
-                GL_STATIC_DRAW
+                self._usage
             )
 
             for i in range(self._attribute_count):
@@ -137,6 +263,49 @@ class VertexObject:
         glBindVertexArray(self._prev_vao)
 
     def update(self, vertices):
+        if self._usage == GL_STATIC_DRAW:
+            return self._update_static(vertices)
+
+        if vertices.size % self._stride != 0:
+            return False
+
+        glBindBuffer(GL_ARRAY_BUFFER, self._vbo)
+        if vertices.nbytes > self._capacity:
+            # Attribute pointers refer to the buffer object rather than its
+            # storage, so the VAO is still valid after reallocation
+            self._capacity = max(vertices.nbytes, self._capacity * 2)
+            self._orphan()
+        elif self._usage == GL_STREAM_DRAW:
+            self._orphan()
+
+        glBufferSubData(GL_ARRAY_BUFFER, 0, vertices.nbytes, vertices)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        self._size = vertices.size
+        self._vertex_count = int(vertices.size / self._stride)
+
+        return True
+
+    # Uploads rows [first, first + count) of vertices, which must have the
+    # same layout and vertex count with the current buffer
+    def update_range(self, vertices, first, count):
+        if vertices.size != self._size or count <= 0:
+            return False
+
+        row_bytes = self._stride * ctypes.sizeof(ctypes.c_float)
+        rows = vertices.reshape((self._vertex_count, self._stride))
+        glBindBuffer(GL_ARRAY_BUFFER, self._vbo)
+        glBufferSubData(
+            GL_ARRAY_BUFFER,
+            first * row_bytes,
+            count * row_bytes,
+            rows[first:first + count]
+        )
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        return True
+
+    def _update_static(self, vertices):
         if vertices.size != self._size:
             return False
 
@@ -150,6 +319,11 @@ class VertexObject:
 
         return True
 
+    def _orphan(self):
+        # Driver hands out fresh storage instead of waiting for the GPU to
+        # finish reading the previous contents
+        glBufferData(GL_ARRAY_BUFFER, self._capacity, None, self._usage)
+
     @property
     def index_object(self):
         return self._index_object
@@ -160,22 +334,271 @@ class VertexObject:
         with self:
             glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, value.id)
 
+    @property
+    def vao(self):
+        return self._vao
+
     @property
     def vertex_count(self):
         return self._vertex_count
 
+    @property
+    def alignment(self):
+        return self._alignment
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def usage(self):
+        return self._usage
+
     @property
     def element_count(self):
         if self.index_object is not None:
             return self.index_object.count
         return 0
 
+    @property
+    def element_type(self):
+        if self.index_object is not None:
+            return self.index_object.index_type
+        return GL_UNSIGNED_SHORT
+
+
+class SeparateVertexObject:
+
+    # Non-interleaved layout, every attribute has its own VBO so that an
+    # attribute can be updated without touching the others
+    # attributes: list of float numpy arrays shaped (vertex count, size)
+    # indices: integer numpy array
+    def __init__(self, attributes, indices=None, usage=GL_STATIC_DRAW):
+        self._vao = 0
+        self._vbos = []
+        self._capacities = []
+        self._prev_vao = 0
+        self._index_object = None
+        # Serial of the InstanceMatrixBuffer instance attributes point to
+        self._instance_buffer = 0
+        self._usage = usage
+        self._alignment = [a.shape[1] for a in attributes]
+        self._vertex_count = attributes[0].shape[0]
+
+        self._vao = glGenVertexArrays(1)
+        with self:
+            for i, data in enumerate(attributes):
+                vbo = glGenBuffers(1)
+                glBindBuffer(GL_ARRAY_BUFFER, vbo)
+                glBufferData(GL_ARRAY_BUFFER, data, self._usage)
+                glVertexAttribPointer(
+                    i,
+                    self._alignment[i],
+                    GL_FLOAT,
+                    False,
+                    0,
+                    None
+                )
+                glEnableVertexAttribArray(i)
+                self._vbos.append(vbo)
+                self._capacities.append(data.nbytes)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        if indices is not None and indices.size > 0:
+            self.index_object = IndexObject(indices)
+
+        debug('svo {} is created VAO({}), VBO({})'.
+              format(self, self._vao, self._vbos))
+
+    def __del__(self):
+        if self._vbos:
+            glDeleteBuffers(len(self._vbos), np.array(self._vbos))
+        if self._vao:
+            glDeleteVertexArrays(1, np.array([self._vao]))
+        debug('svo {} is deleted'.format(self))
+
+    def __enter__(self):
+        self._prev_vao = glGetIntegerv(GL_VERTEX_ARRAY_BINDING)
+        glBindVertexArray(self._vao)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        glBindVertexArray(self._prev_vao)
+
+    # Uploads rows [first, first + count) of the attribute at index.
+    # A whole attribute with a different vertex count may be given only
+    # with first=0 and count=None, others should follow it.
+    def update_attribute(self, index, data, first=0, count=None):
+        glBindBuffer(GL_ARRAY_BUFFER, self._vbos[index])
+        if count is None:
+            if data.nbytes > self._capacities[index]:
+                self._capacities[index] = max(
+                    data.nbytes,
+                    self._capacities[index] * 2
+                )
+                glBufferData(
+                    GL_ARRAY_BUFFER,
+                    self._capacities[index],
+                    None,
+                    self._usage
+                )
+            glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+            self._vertex_count = data.shape[0]
+        elif count > 0:
+            row_bytes = data.nbytes // data.shape[0]
+            glBufferSubData(
+                GL_ARRAY_BUFFER,
+                first * row_bytes,
+                count * row_bytes,
+                data[first:first + count]
+            )
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    @property
+    def index_object(self):
+        return self._index_object
+
+    @index_object.setter
+    def index_object(self, value):
+        self._index_object = value
+        with self:
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, value.id)
+
+    @property
+    def vao(self):
+        return self._vao
+
+    @property
+    def alignment(self):
+        return self._alignment
+
+    @property
+    def usage(self):
+        return self._usage
+
+    @property
+    def vertex_count(self):
+        return self._vertex_count
+
+    @property
+    def element_count(self):
+        if self.index_object is not None:
+            return self.index_object.count
+        return 0
+
+    @property
+    def element_type(self):
+        if self.index_object is not None:
+            return self.index_object.index_type
+        return GL_UNSIGNED_SHORT
+
+
+class InstanceMatrixBuffer:
+
+    # Buffer names are reused once deleted, so buffers are told apart by
+    # a serial number which is never reused
+    _serials = 0
+
+    # Per-instance mat4 attribute, which occupies 4 consecutive locations
+    # starting from 'location' with vertex attribute divisor 1
+    def __init__(self, location=3, usage=GL_DYNAMIC_DRAW):
+        InstanceMatrixBuffer._serials += 1
+        self._serial = InstanceMatrixBuffer._serials
+        self._id = glGenBuffers(1)
+        self._location = location
+        self._usage = usage
+        self._capacity = 0
+        self._count = 0
+        debug('imb {} is created VBO({})'.format(self, self._id))
+
+    def __del__(self):
+        if self._id > 0:
+            glDeleteBuffers(1, np.array([self._id]))
+        debug('imb {} is deleted'.format(self))
+
+    # matrices: float32 numpy array shaped (N, 4, 4)
+    def update(self, matrices):
+        matrices = np.ascontiguousarray(matrices, dtype=np.float32)
+        self._count = int(matrices.size / 16)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self._id)
+        if matrices.nbytes > self._capacity:
+            glBufferData(
+                GL_ARRAY_BUFFER,
+                matrices,
+                self._usage
+            )
+            self._capacity = matrices.nbytes
+        elif matrices.nbytes > 0:
+            glBufferSubData(
+                GL_ARRAY_BUFFER,
+                0,
+                matrices.nbytes,
+                matrices
+            )
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def attach(self, vertexobj):
+        # VAO keeps the attribute setup, so it's skipped while the vertex
+        # object still points to this buffer. The record is kept on the
+        # vertex object since buffers of several renderers or instance
+        # arrays may draw the same model.
+        if vertexobj._instance_buffer == self._serial:
+            return
+
+        vec4_size = 4 * ctypes.sizeof(ctypes.c_float)
+        with vertexobj:
+            glBindBuffer(GL_ARRAY_BUFFER, self._id)
+            for i in range(4):
+                glVertexAttribPointer(
+                    self._location + i,
+                    4,
+                    GL_FLOAT,
+                    False,
+                    4 * vec4_size,
+                    ctypes.c_void_p(i * vec4_size)
+                )
+                glEnableVertexAttribArray(self._location + i)
+                glVertexAttribDivisor(self._location + i, 1)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        vertexobj._instance_buffer = self._serial
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def id(self):
+        return self._id
+
+
+INDEX_TYPES = (
+    (np.uint8, GL_UNSIGNED_BYTE),
+    (np.uint16, GL_UNSIGNED_SHORT),
+    (np.uint32, GL_UNSIGNED_INT),
+)
+
+
+def fit_indices(indices):
+    # Picks the smallest index type which can hold the largest index
+    indices = np.asarray(indices)
+    max_index = int(indices.max()) if indices.size > 0 else 0
+    for dtype, gl_type in INDEX_TYPES:
+        if max_index <= np.iinfo(dtype).max:
+            return indices.astype(dtype, copy=False), gl_type
+
+    raise ValueError('Index {} exceeds uint32 range'.format(max_index))
+
 
 class IndexObject:
 
+    # indices: integer numpy array, stored with the smallest type that
+    # fits its largest index (uint8, uint16 or uint32)
     def __init__(self, indices):
         self._id = 0
         self._prev_ebo = 0
+        self._index_type = GL_UNSIGNED_SHORT
         self.update(indices)
         debug('eo {} is created EBO({})'.format(self, self.id))
 
@@ -188,6 +611,7 @@ class IndexObject:
         if self._id is 0:
             self._id = glGenBuffers(1)
 
+        indices, self._index_type = fit_indices(indices)
         self._count = indices.size
         with self:
             glBufferData(
@@ -213,6 +637,11 @@ class IndexObject:
         # count is a read-only property
         raise AttributeError
 
+    @property
+    def index_type(self):
+        # GL type to be passed to glDrawElements
+        return self._index_type
+
     @property
     def id(self):
         return self._id
@@ -223,19 +652,41 @@ class IndexObject:
         raise AttributeError
 
 
+# Sized internal formats used for texture storage
+INTERNAL_FORMATS = {
+    GL_RED: GL_R8,
+    GL_RG: GL_RG8,
+    GL_RGB: GL_RGB8,
+    GL_RGBA: GL_RGBA8,
+    GL_BGR: GL_RGB8,
+    GL_BGRA: GL_RGBA8,
+}
+
+
 class Texture:
 
+    # pixel_buffers: number of pixel unpack buffers streaming images, with
+    #                2 or 3 of them an upload returns without waiting for
+    #                the GPU to finish reading the previous image
     def __init__(
             self,
             image=None,
             width=0, height=0,
             target=GL_TEXTURE_2D,
             unit=GL_TEXTURE0,
-            format=GL_RGB):
+            format=GL_RGB,
+            pixel_buffers=0):
         self._target = target
         self._unit = unit
         self._format = format
-        self._id = glGenTextures(1)
+        self._id = 0
+        self._width = 0
+        self._height = 0
+        self._storage = None
+        self._immutable = None
+        self._pixel_buffers = pixel_buffers
+        self._pbos = []
+        self._pbo_index = 0
 
         self.update(
             image=image,
@@ -244,7 +695,15 @@ class Texture:
         )
 
     def __del__(self):
-        glDeleteTextures(np.array([self.id], dtype='int32'))
+        self.release()
+
+    # Frees GL objects now instead of waiting for garbage collection
+    def release(self):
+        self._release_texture()
+        if self._pbos:
+            glDeleteBuffers(len(self._pbos), np.array(self._pbos))
+        self._pbos = []
+        self._pbo_index = 0
 
     def __enter__(self):
         self.bind(active_texture=True)
@@ -263,37 +722,132 @@ class Texture:
         glBindTexture(self._target, 0)
 
     # image is numpy uint8 array
+    # Storage is allocated only when size, format or target is changed,
+    # otherwise the image is streamed into the existing storage
     def update(self, **kwargs):
-        self._target = kwargs.pop('target', self._target)
+        target = kwargs.pop('target', self._target)
+        format = kwargs.pop('format', self._format)
         self._unit = kwargs.pop('unit', self._unit)
-        self._format = kwargs.pop('format', self._format)
 
         image = kwargs.pop('image', None)
         if image is not None:
-            self._width, self._height = image.shape[1], image.shape[0]
+            width, height = image.shape[1], image.shape[0]
         else:
-            self._width = kwargs.pop('width', 0)
-            self._height = kwargs.pop('height', 0)
+            width = kwargs.pop('width', 0)
+            height = kwargs.pop('height', 0)
 
-        glBindTexture(self._target, self.id)
-        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
-        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
-        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        if target != self._target:
+            self._release_texture()
+        self._target = target
+        self._format = format
+        self._width = width
+        self._height = height
 
-        glTexImage2D(
-            self._target,
-            0,
-            self._format,
-            self._width, self._height,
-            0,
-            self._format,  # GL_RGB,  # BGR
-            GL_UNSIGNED_BYTE,
-            image
-        )
+        if self._storage != (width, height, format) or self._id == 0:
+            self._allocate()
+
+        if image is not None:
+            self._upload(image)
 
+    def _release_texture(self):
+        if self._id:
+            glDeleteTextures(np.array([self._id], dtype='int32'))
+        self._id = 0
+        self._storage = None
+
+    def _allocate(self):
+        if self._immutable is None:
+            self._immutable = bool(glTexStorage2D)
+
+        # Immutable storage can't be respecified, so a new object is made
+        if self._immutable and self._storage is not None:
+            self._release_texture()
+
+        if self._id == 0:
+            self._id = glGenTextures(1)
+            glBindTexture(self._target, self._id)
+            # Parameters are kept by the texture object, not set per frame
+            glTexParameteri(self._target, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+            glTexParameteri(self._target, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+            glTexParameteri(self._target, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+            glTexParameteri(self._target, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+
+        glBindTexture(self._target, self._id)
+        internal_format = INTERNAL_FORMATS.get(self._format, self._format)
+        if self._width > 0 and self._height > 0:
+            if self._immutable:
+                glTexStorage2D(
+                    self._target,
+                    1,
+                    internal_format,
+                    self._width, self._height
+                )
+            else:
+                glTexImage2D(
+                    self._target,
+                    0,
+                    internal_format,
+                    self._width, self._height,
+                    0,
+                    self._format,
+                    GL_UNSIGNED_BYTE,
+                    None
+                )
+            self._storage = (self._width, self._height, self._format)
+        glBindTexture(self._target, 0)
+
+    def _upload(self, image):
+        image = np.ascontiguousarray(image)
+        # Rows of an RGB image are not always 4-byte aligned
+        packed = image.strides[0] % 4 != 0
+        if packed:
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+
+        glBindTexture(self._target, self._id)
+        if self._pixel_buffers > 0:
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, self._next_pbo())
+            # Orphaning lets the driver hand out fresh memory instead of
+            # waiting for a pending transfer from this buffer
+            glBufferData(
+                GL_PIXEL_UNPACK_BUFFER,
+                image.nbytes,
+                None,
+                GL_STREAM_DRAW
+            )
+            glBufferSubData(GL_PIXEL_UNPACK_BUFFER, 0, image.nbytes, image)
+            glTexSubImage2D(
+                self._target,
+                0,
+                0, 0,
+                self._width, self._height,
+                self._format,
+                GL_UNSIGNED_BYTE,
+                ctypes.c_void_p(0)
+            )
+            glBindBuffer(GL_PIXEL_UNPACK_BUFFER, 0)
+        else:
+            glTexSubImage2D(
+                self._target,
+                0,
+                0, 0,
+                self._width, self._height,
+                self._format,
+                GL_UNSIGNED_BYTE,
+                image
+            )
         glBindTexture(self._target, 0)
 
+        if packed:
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+
+    def _next_pbo(self):
+        if not self._pbos:
+            for i in range(self._pixel_buffers):
+                self._pbos.append(glGenBuffers(1))
+        pbo = self._pbos[self._pbo_index]
+        self._pbo_index = (self._pbo_index + 1) % len(self._pbos)
+        return pbo
+
     @property
     def id(self):
         return self._id
@@ -326,3 +880,121 @@ class Texture:
     @property
     def height(self):
         return self._height
+
+
+class TextureArray:
+
+    # Layers of the same size sampled by one sampler2DArray, so that many
+    # images are drawn with one texture binding
+    def __init__(
+            self,
+            width, height, layers,
+            unit=GL_TEXTURE0,
+            format=GL_RGB):
+        self._unit = unit
+        self._format = format
+        self._width = width
+        self._height = height
+        self._layers = layers
+        self._id = glGenTextures(1)
+
+        target = GL_TEXTURE_2D_ARRAY
+        glBindTexture(target, self._id)
+        glTexParameteri(target, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(target, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexParameteri(target, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(target, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        internal_format = INTERNAL_FORMATS.get(format, format)
+        if bool(glTexStorage3D):
+            glTexStorage3D(
+                GL_TEXTURE_2D_ARRAY,
+                1,
+                internal_format,
+                width, height, layers
+            )
+        else:
+            glTexImage3D(
+                GL_TEXTURE_2D_ARRAY,
+                0,
+                internal_format,
+                width, height, layers,
+                0,
+                format,
+                GL_UNSIGNED_BYTE,
+                None
+            )
+        glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+
+    def __del__(self):
+        glDeleteTextures(np.array([self.id], dtype='int32'))
+
+    def __enter__(self):
+        self.bind(active_texture=True)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.unbind()
+
+    def bind(self, active_texture=True):
+        if active_texture:
+            glActiveTexture(self._unit)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self.id)
+
+    def unbind(self):
+        glActiveTexture(self._unit)
+        glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+
+    # image is numpy uint8 array of width x height
+    def update_layer(self, layer, image):
+        image = np.ascontiguousarray(image)
+        packed = image.strides[0] % 4 != 0
+        if packed:
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+
+        glBindTexture(GL_TEXTURE_2D_ARRAY, self._id)
+        glTexSubImage3D(
+            GL_TEXTURE_2D_ARRAY,
+            0,
+            0, 0, layer,
+            self._width, self._height, 1,
+            self._format,
+            GL_UNSIGNED_BYTE,
+            image
+        )
+        glBindTexture(GL_TEXTURE_2D_ARRAY, 0)
+
+        if packed:
+            glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+
+    @property
+    def id(self):
+        return self._id
+
+    @id.setter
+    def id(self, value):
+        # id is a read-only property
+        raise AttributeError
+
+    @property
+    def unit_number(self):
+        return self.unit - GL_TEXTURE0
+
+    @property
+    def unit(self):
+        return self._unit
+
+    @property
+    def format(self):
+        return self._format
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def layers(self):
+        return self._layers
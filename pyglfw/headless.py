@@ -0,0 +1,277 @@
+import argparse
+import ctypes
+import os
+
+# PyOpenGL binds its platform on the first import of OpenGL, so this module
+# has to be imported before any other module of pyglfw to take effect
+os.environ.setdefault('PYOPENGL_PLATFORM', 'egl')
+if os.environ['PYOPENGL_PLATFORM'] == 'egl':
+    # Renders without any display server
+    os.environ.setdefault('EGL_PLATFORM', 'surfaceless')
+
+import numpy as np
+
+from OpenGL.GL import *
+
+from .fbo import Framebuffer
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+BACKENDS = ('egl', 'osmesa')
+
+
+class HeadlessContext:
+
+    # GL 3.3 core context without a window. The backend is the platform
+    # PyOpenGL is bound to, which PYOPENGL_PLATFORM selects.
+    def __init__(self, major=3, minor=3):
+        self._backend = os.environ.get('PYOPENGL_PLATFORM')
+        if self._backend not in BACKENDS:
+            raise RuntimeError(
+                'Unsupported headless backend: {}'.format(self._backend)
+            )
+
+        self._display = None
+        self._context = None
+        self._buffer = None
+
+        if self._backend == 'egl':
+            self._create_egl(major, minor)
+        else:
+            self._create_osmesa(major, minor)
+        debug('GL_RENDERER: {}'.format(glGetString(GL_RENDERER)))
+
+    def _create_egl(self, major, minor):
+        from OpenGL import EGL
+
+        display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+        major_version, minor_version = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(display, ctypes.pointer(major_version),
+                                 ctypes.pointer(minor_version)):
+            raise RuntimeError('Failed to initialize EGL display')
+
+        config_attrs = (EGL.EGLint * 5)(
+            EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT,
+            EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+            EGL.EGL_NONE
+        )
+        config = EGL.EGLConfig()
+        num_configs = EGL.EGLint()
+        EGL.eglChooseConfig(
+            display, config_attrs, ctypes.pointer(config), 1,
+            ctypes.pointer(num_configs)
+        )
+        if num_configs.value < 1:
+            raise RuntimeError('No EGL config for OpenGL')
+
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attrs = (EGL.EGLint * 7)(
+            EGL.EGL_CONTEXT_MAJOR_VERSION, major,
+            EGL.EGL_CONTEXT_MINOR_VERSION, minor,
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+            EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+            EGL.EGL_NONE
+        )
+        context = EGL.eglCreateContext(
+            display, config, EGL.EGL_NO_CONTEXT, context_attrs
+        )
+        if context == EGL.EGL_NO_CONTEXT:
+            raise RuntimeError('Failed to create EGL context')
+
+        self._display = display
+        self._context = context
+        self.make_current()
+
+    def _create_osmesa(self, major, minor):
+        from OpenGL import osmesa
+
+        attrs = (ctypes.c_int * 11)(
+            osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+            osmesa.OSMESA_DEPTH_BITS, 24,
+            osmesa.OSMESA_PROFILE, osmesa.OSMESA_CORE_PROFILE,
+            osmesa.OSMESA_CONTEXT_MAJOR_VERSION, major,
+            osmesa.OSMESA_CONTEXT_MINOR_VERSION, minor,
+            0
+        )
+        context = osmesa.OSMesaCreateContextAttribs(attrs, None)
+        if not context:
+            raise RuntimeError('Failed to create OSMesa context')
+
+        # OSMesa needs a buffer to be current, rendering goes to
+        # framebuffer objects anyway
+        self._buffer = np.zeros((1, 1, 4), dtype=np.uint8)
+        self._context = context
+        self.make_current()
+
+    def make_current(self):
+        if self._backend == 'egl':
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(
+                self._display,
+                EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE,
+                self._context
+            )
+        else:
+            from OpenGL import osmesa
+            osmesa.OSMesaMakeCurrent(
+                self._context, self._buffer, GL_UNSIGNED_BYTE, 1, 1
+            )
+
+    def release(self):
+        if self._context is None:
+            return
+
+        if self._backend == 'egl':
+            from OpenGL import EGL
+            EGL.eglMakeCurrent(
+                self._display,
+                EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE,
+                EGL.EGL_NO_CONTEXT
+            )
+            EGL.eglDestroyContext(self._display, self._context)
+        else:
+            from OpenGL import osmesa
+            osmesa.OSMesaDestroyContext(self._context)
+        self._context = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.release()
+
+    @property
+    def backend(self):
+        return self._backend
+
+
+def create_context(major=3, minor=3):
+    return HeadlessContext(major, minor)
+
+
+class HeadlessRenderer:
+
+    # Renders a RendererBase into a Framebuffer the same way GLWidget does,
+    # and returns frames as numpy uint8 arrays (height, width, 3) with
+    # the top row first
+    def __init__(self, renderer, width, height, samples=0,
+                 clear_color=(0.0, 0.0, 0.0, 1.0)):
+        self._renderer = renderer
+        self._width = width
+        self._height = height
+        self._clear_color = clear_color
+        self._framebuffer = Framebuffer(
+            width=width,
+            height=height,
+            samples=samples
+        )
+
+        self._renderer.prepare()
+        self._reshaped = False
+
+    def render(self):
+        with self._framebuffer:
+            if not self._reshaped:
+                self._renderer.reshape(self._width, self._height)
+                self._reshaped = True
+
+            glClearColor(*self._clear_color)
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            glEnable(GL_DEPTH_TEST)
+            glEnable(GL_CULL_FACE)
+            self._renderer.render()
+
+        return self._framebuffer.read_async().result()[::-1]
+
+    def resize(self, width, height):
+        self._width = width
+        self._height = height
+        self._framebuffer.width = width
+        self._framebuffer.height = height
+        self._reshaped = False
+
+    def release(self):
+        self._renderer.dispose()
+        self._framebuffer.release()
+
+    @property
+    def renderer(self):
+        return self._renderer
+
+    @property
+    def framebuffer(self):
+        return self._framebuffer
+
+
+def render_scene(jsonpath, width, height, samples=0, frames=1):
+    from . import scene
+
+    renderer = HeadlessRenderer(
+        scene.load_fromjson(jsonpath),
+        width, height,
+        samples=samples
+    )
+    for __ in range(frames):
+        image = renderer.render()
+    renderer.release()
+    return image
+
+
+def main():
+    global verbose
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        default=False,
+        help='Print debug string'
+    )
+    parser.add_argument(
+        'filepath',
+        help='Scene JSON file path'
+    )
+    parser.add_argument(
+        '--output', '-o',
+        default='scene.png',
+        help='Output PNG file path'
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        nargs=2,
+        default=[640, 480],
+        help='Image width and height'
+    )
+    parser.add_argument(
+        '--samples', '-s',
+        type=int,
+        default=4,
+        help='Multisample count (0 to disable)'
+    )
+
+    args = parser.parse_args()
+    verbose = args.verbose
+
+    from PIL import Image
+
+    context = create_context()
+    image = render_scene(
+        args.filepath,
+        args.size[0], args.size[1],
+        samples=args.samples
+    )
+    Image.fromarray(image).save(args.output)
+    context.release()
+    print(args.output)
+
+
+if __name__ == '__main__':
+    main()
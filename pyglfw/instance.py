@@ -4,6 +4,7 @@ import pyrr
 from .camera import Camera
 from .light import DirectionalLight
 from .renderer import Renderer
+from .framework import InstanceMatrixBuffer
 from .renderer import resource_path
 
 
@@ -15,22 +16,172 @@ def debug(msg):
         print(msg)
 
 
+class InstanceArray:
+
+    # Structure-of-arrays storage of instance transforms. Model matrices
+    # of all dirty rows are computed in a single vectorized pass, which
+    # gives the same result as ModelInstance.model_matrix did with pyrr:
+    # rotation * (scale * translation)
+    def __init__(self, capacity=64):
+        self._size = 0
+        self._free = []
+        self._any_dirty = False
+        self._generation = 0
+
+        capacity = max(int(capacity), 1)
+        self._translations = np.zeros((capacity, 3), dtype=np.float32)
+        self._rotations = np.zeros((capacity, 3), dtype=np.float32)
+        self._scales = np.ones((capacity, 3), dtype=np.float32)
+        self._matrices = np.tile(
+            np.identity(4, dtype=np.float32),
+            (capacity, 1, 1)
+        )
+        self._dirty = np.zeros(capacity, dtype=bool)
+
+    def _grow(self, capacity):
+        def _resized(old, fill):
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:old.shape[0]] = old
+            new[old.shape[0]:] = fill
+            return new
+
+        self._translations = _resized(self._translations, 0.0)
+        self._rotations = _resized(self._rotations, 0.0)
+        self._scales = _resized(self._scales, 1.0)
+        self._matrices = _resized(
+            self._matrices,
+            np.identity(4, dtype=np.float32)
+        )
+        self._dirty = _resized(self._dirty, False)
+
+    def allocate(self):
+        if self._free:
+            index = self._free.pop()
+        else:
+            if self._size == self.capacity:
+                self._grow(self.capacity * 2)
+            index = self._size
+            self._size += 1
+
+        self._translations[index] = 0.0
+        self._rotations[index] = 0.0
+        self._scales[index] = 1.0
+        self.mark_dirty(index)
+        return index
+
+    def release(self, index):
+        self._dirty[index] = False
+        self._free.append(index)
+
+    def mark_dirty(self, index):
+        self._dirty[index] = True
+        self._any_dirty = True
+
+    def update(self):
+        if not self._any_dirty:
+            return
+
+        rows = np.flatnonzero(self._dirty[:self._size])
+        self._compute(rows)
+        self._dirty[rows] = False
+        self._any_dirty = False
+        self._generation += 1
+
+    def _compute(self, rows):
+        eulers = np.radians(self._rotations[rows])
+        roll, pitch, yaw = eulers[:, 0], eulers[:, 1], eulers[:, 2]
+
+        sP, cP = np.sin(pitch), np.cos(pitch)
+        sR, cR = np.sin(roll), np.cos(roll)
+        sY, cY = np.sin(yaw), np.cos(yaw)
+
+        # Same layout with pyrr.matrix33.create_from_eulers
+        rot = np.empty((rows.size, 3, 3), dtype=np.float32)
+        rot[:, 0, 0] = cY * cP
+        rot[:, 0, 1] = -cY * sP * cR + sY * sR
+        rot[:, 0, 2] = cY * sP * sR + sY * cR
+        rot[:, 1, 0] = sP
+        rot[:, 1, 1] = cP * cR
+        rot[:, 1, 2] = -cP * sR
+        rot[:, 2, 0] = -sY * cP
+        rot[:, 2, 1] = sY * sP * cR + cY * sR
+        rot[:, 2, 2] = -sY * sP * sR + cY * cR
+
+        mat = np.zeros((rows.size, 4, 4), dtype=np.float32)
+        mat[:, :3, :3] = rot * self._scales[rows][:, np.newaxis, :]
+        mat[:, 3, :3] = self._translations[rows]
+        mat[:, 3, 3] = 1.0
+        self._matrices[rows] = mat
+
+    @property
+    def capacity(self):
+        return self._translations.shape[0]
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def generation(self):
+        # Increased whenever any model matrix is recomputed
+        return self._generation
+
+    @property
+    def translations(self):
+        return self._translations
+
+    @property
+    def rotations(self):
+        return self._rotations
+
+    @property
+    def scales(self):
+        return self._scales
+
+    @property
+    def matrices(self):
+        self.update()
+        return self._matrices
+
+
+# Instances are allocated from this array unless another one is given,
+# so that every instance can be updated with a single vectorized pass
+default_instance_array = InstanceArray()
+
+
 class ModelInstance:
 
+    # Increased when an instance is created, deleted, shown/hidden or its
+    # model is changed, so that renderers can cache instance grouping
+    layout_version = 0
+
     def __init__(
             self, name='',
             model=None,
             renderer_spec={},
             translation=[0.0, 0.0, 0.0],
             rotation=[0.0, 0.0, 0.0],
-            scale=[1.0, 1.0, 1.0]):
+            scale=[1.0, 1.0, 1.0],
+            array=None):
+        self._array = (array, default_instance_array)[array is None]
+        self._index = self._array.allocate()
+        self._model = None
+        self._show = True
+
         self.name = name
         self.model = model
         self.renderer_spec = renderer_spec
-        self.translation = translation
-        self.rotation = rotation
-        self.scale = scale
-        self.show = True
+        if translation is not None:
+            self.translation = translation
+        if rotation is not None:
+            self.rotation = rotation
+        if scale is not None:
+            self.scale = scale
+
+    def __del__(self):
+        if getattr(self, '_array', None) is not None:
+            self._array.release(self._index)
+            ModelInstance.layout_version += 1
 
     def prepare(self):
         if self.model:
@@ -48,18 +199,72 @@ class ModelInstance:
         if self.model:
             self.model.dispose()
 
+    def _row(self, values):
+        # Read-only view; assign to the property to update a value. It
+        # reflects later updates and goes stale once the array grows, so
+        # copy it to keep a value.
+        row = values[self._index]
+        row.flags.writeable = False
+        return row
+
+    @property
+    def array(self):
+        return self._array
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def model(self):
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+        ModelInstance.layout_version += 1
+
+    @property
+    def show(self):
+        return self._show
+
+    @show.setter
+    def show(self, value):
+        if self._show != value:
+            self._show = value
+            ModelInstance.layout_version += 1
+
+    @property
+    def translation(self):
+        return self._row(self._array.translations)
+
+    @translation.setter
+    def translation(self, value):
+        self._array.translations[self._index] = value
+        self._array.mark_dirty(self._index)
+
+    @property
+    def rotation(self):
+        return self._row(self._array.rotations)
+
+    @rotation.setter
+    def rotation(self, value):
+        self._array.rotations[self._index] = value
+        self._array.mark_dirty(self._index)
+
+    @property
+    def scale(self):
+        return self._row(self._array.scales)
+
+    @scale.setter
+    def scale(self, value):
+        self._array.scales[self._index] = value
+        self._array.mark_dirty(self._index)
+
     @property
     def model_matrix(self):
-        scale_mat = pyrr.matrix44.create_from_scale(
-            np.array(self.scale, dtype=np.float32)
-        )
-        trans_mat = pyrr.matrix44.create_from_translation(
-            np.array(self.translation, dtype=np.float32)
-        )
-        rot_mat = pyrr.matrix44.create_from_eulers(
-            np.radians(np.array(self.rotation, dtype=np.float32))
-        )
-        return np.matmul(rot_mat, np.matmul(scale_mat, trans_mat))
+        # Independent of later updates and growth of the array
+        return self._array.matrices[self._index].copy()
 
 
 class MonoInstanceRenderer(Renderer):
@@ -143,14 +348,35 @@ class MonoInstanceRenderer(Renderer):
             return
 
         with self._program as p:
-            if self.camera is None:
-                p.setMatrix4('view', pyrr.matrix44.create_identity())
-            else:
-                p.setMatrix4('view', self.camera.view_matrix)
-                p.setVec3f('viewPos', self.camera.position)
+            self._setup_program(p)
+            self._draw_instances(p)
+
+    # Adds the draws of render() to a RenderQueue instead of drawing, so
+    # that they're sorted together with the ones of other renderers
+    def enqueue(self, queue):
+        self._check_update()
+
+        for i in self.instances:
+            if i.show and i.model:
+                queue.add(
+                    self._program,
+                    i.model,
+                    matrix=i.model_matrix,
+                    setup=self._setup_program,
+                    renderer=self
+                )
 
-            for i in self.instances:
-                i.draw(p)
+    def _setup_program(self, program):
+        # Uniforms shared by every instance of a frame
+        if self.camera is None:
+            program.setMatrix4('view', pyrr.matrix44.create_identity())
+        else:
+            program.setMatrix4('view', self.camera.view_matrix)
+            program.setVec3f('viewPos', self.camera.position)
+
+    def _draw_instances(self, program):
+        for i in self.instances:
+            i.draw(program)
 
     def dispose(self):
         super().dispose()
@@ -164,6 +390,10 @@ class InstanceRenderer(MonoInstanceRenderer):
         resource_path('./shader/model_color_light.vs'),
         resource_path('./shader/model_mat.vs')
     )
+    default_instanced_vs_path = (
+        resource_path('./shader/model_color_light_instanced.vs'),
+        resource_path('./shader/model_mat_instanced.vs')
+    )
     default_fs_path = (
         resource_path('./shader/model_color_light.fs'),
         resource_path('./shader/model_mat.fs')
@@ -177,9 +407,13 @@ class InstanceRenderer(MonoInstanceRenderer):
             name='',
             camera=None,
             lights=[],
-            use_material=False):
+            use_material=False,
+            instanced=False):
         if vs_path is None or fs_path is None:
-            vs_path = self.default_vs_path[use_material]
+            vs_path = (
+                self.default_vs_path,
+                self.default_instanced_vs_path
+            )[instanced][use_material]
             fs_path = self.default_fs_path[use_material]
 
         super().__init__(
@@ -190,13 +424,90 @@ class InstanceRenderer(MonoInstanceRenderer):
             camera=camera
         )
         self.lights = lights
+        self.instanced = instanced
+        self._instance_buffers = {}
+        self._groups = None
+        self._groups_instances = []
+        self._groups_version = -1
+
+    def enqueue(self, queue):
+        if not self.instanced:
+            super().enqueue(queue)
+            return
 
-    def render(self):
-        if len(self.instances) == 0:
+        self._check_update()
+
+        for model, positions, buf in self._update_instance_buffers():
+            queue.add(
+                self._program,
+                model,
+                instance_buffer=buf,
+                positions=positions,
+                setup=self._setup_program,
+                renderer=self
+            )
+
+    def _setup_program(self, program):
+        for light in self.lights:
+            light.update(program)
+        super()._setup_program(program)
+
+    def _draw_instances(self, program):
+        if not self.instanced:
+            super()._draw_instances(program)
             return
 
-        with self._program as p:
-            for light in self.lights:
-                light.update(p)
+        for model, positions, buf in self._update_instance_buffers():
+            model.draw_instanced(program, buf)
+
+    def _update_instance_buffers(self):
+        # Instances sharing a model are drawn with a single draw call,
+        # taking their model matrices from a per-instance attribute.
+        # Returns (model, instance positions, buffer) of every group.
+        buffers = {}
+        draws = []
+        for model, array, indices in self._instance_groups():
+            key = (model, array)
+            buf, prev_state = self._instance_buffers.get(key, (None, None))
+            if buf is None:
+                buf = InstanceMatrixBuffer()
+
+            # Matrices are uploaded only if any of them has been changed
+            array.update()
+            state = (array.generation, self._groups_version)
+            if state != prev_state:
+                buf.update(array.matrices[indices])
+
+            buffers[key] = (buf, state)
+            draws.append((model, array.matrices[indices, 3, :3], buf))
+
+        self._instance_buffers = buffers
+        return draws
+
+    def _instance_groups(self):
+        # Grouping is rebuilt only if the instance list or the layout of
+        # any instance has been changed
+        if self._groups is not None and \
+           self._groups_version == ModelInstance.layout_version and \
+           self._groups_instances == self.instances:
+            return self._groups
+
+        groups = {}
+        for i in self.instances:
+            if i.show and i.model:
+                key = (i.model, i.array)
+                groups.setdefault(key, []).append(i.index)
 
-        super().render()
+        self._groups = [
+            (model, array, np.array(indices, dtype=np.intp))
+            for (model, array), indices in groups.items()
+        ]
+        self._groups_instances = list(self.instances)
+        self._groups_version = ModelInstance.layout_version
+
+        return self._groups
+
+    def dispose(self):
+        super().dispose()
+        self._instance_buffers = {}
+        self._groups = None
@@ -54,6 +54,8 @@ def load_light(desc):
 
 class Light:
 
+    UNIFORM_KEYS = ('ambient', 'diffuse', 'specular')
+
     def __init__(self,
                  name='light',
                  ambient=None,
@@ -69,13 +71,28 @@ class Light:
         self.name = name
 
     def update(self, program):
-        program.setVec3f(self.name + '.ambient', self.ambient)
-        program.setVec3f(self.name + '.diffuse', self.diffuse)
-        program.setVec3f(self.name + '.specular', self.specular)
+        names = self._uniform_names
+        program.setVec3f(names['ambient'], self.ambient)
+        program.setVec3f(names['diffuse'], self.diffuse)
+        program.setVec3f(names['specular'], self.specular)
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+        # Uniform names are built once here instead of on every update
+        self._uniform_names = {
+            key: '{}.{}'.format(value, key) for key in self.UNIFORM_KEYS
+        }
 
 
 class DirectionalLight(Light):
 
+    UNIFORM_KEYS = Light.UNIFORM_KEYS + ('direction',)
+
     def __init__(self,
                  name='dirLight',
                  direction=None,
@@ -94,11 +111,15 @@ class DirectionalLight(Light):
 
     def update(self, program):
         super().update(program)
-        program.setVec3f(self.name + '.direction', self.direction)
+        program.setVec3f(self._uniform_names['direction'], self.direction)
 
 
 class PointLight(Light):
 
+    UNIFORM_KEYS = Light.UNIFORM_KEYS + (
+        'position', 'constant', 'linear', 'quadratic'
+    )
+
     def __init__(self,
                  name='pointLight',
                  position=None,
@@ -125,7 +146,8 @@ class PointLight(Light):
     def update(self, program):
         super().update(program)
 
-        program.setVec3f(self.name + '.position', self.position)
-        program.setFloat(self.name + '.constant', self.constant)
-        program.setFloat(self.name + '.linear', self.linear)
-        program.setFloat(self.name + '.quadratic', self.quadratic)
+        names = self._uniform_names
+        program.setVec3f(names['position'], self.position)
+        program.setFloat(names['constant'], self.constant)
+        program.setFloat(names['linear'], self.linear)
+        program.setFloat(names['quadratic'], self.quadratic)
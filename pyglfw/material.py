@@ -18,7 +18,24 @@ def debug(msg):
         print(msg)
 
 
-def load_material(desc, basepath='.'):
+IMAGE_KEYS = ('diffuse', 'specular', 'normal', 'depth')
+
+
+def decode_image(imgpath):
+    # Needs no GL context, so it can run on worker threads
+    img = cv2.imread(imgpath)
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def image_paths(desc, basepath='.'):
+    return [
+        os.path.join(basepath, desc[key])
+        for key in IMAGE_KEYS if key in desc
+    ]
+
+
+# images: optional dict of already decoded images keyed by their paths
+def load_material(desc, basepath='.', images=None):
     def _pick(dic, key, default=None):
         if key not in dic:
             return default
@@ -47,8 +64,10 @@ def load_material(desc, basepath='.'):
 
     def _add_image(name, imgpath, to):
         if imgpath is not None:
-            img = cv2.imread(imgpath)
-            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            if images is not None and imgpath in images:
+                img = images[imgpath]
+            else:
+                img = decode_image(imgpath)
             to.add_image(name, img)
 
     _add_image('diffuse', diffuse_path, material)
@@ -71,6 +90,7 @@ def load_fromjson(jsonpath):
 class Material:
 
     def __init__(self, name='material', textures={}):
+        self._uniform_names = {}
         self.name = name
         self.textures = {}
         self._images_pending = {}
@@ -113,20 +133,46 @@ class Material:
     def add_image(self, name, image):
         self._images_pending[name] = image
 
+    def prepare(self):
+        # Uploads pending images, needs a current GL context
+        self._update_textures()
+
     def dispose_image(self, name):
         self.textures.pop(name, None)
 
     def dispose_all(self):
         self.textures = {}
 
-    def update(self, program):
+    # queue: RenderQueue binding the textures, which skips the ones
+    # already bound on their units
+    def update(self, program, queue=None):
         self._update_textures()
-        namespace = ('', str(self.name) + '.')[self.name is not None]
         for texname, tex in self.textures.items():
-            tex.bind()
-            program.setInt(namespace + texname, tex.unit_number)
-
-        program.setFloat(namespace + 'shininess', self.shininess)
+            if queue is None:
+                tex.bind()
+            else:
+                queue.bind_texture(tex)
+            program.setInt(self._uniform_name(texname), tex.unit_number)
+
+        program.setFloat(self._uniform_name('shininess'), self.shininess)
+
+    def _uniform_name(self, key):
+        # Cache namespaced names to avoid building strings on every frame
+        name = self._uniform_names.get(key)
+        if name is None:
+            namespace = ('', str(self.name) + '.')[self.name is not None]
+            name = namespace + key
+            self._uniform_names[key] = name
+        return name
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self._name = value
+        self._uniform_names = {}
 
     def restore(self):
         for texname, tex in self.textures.items():
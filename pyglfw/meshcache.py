@@ -0,0 +1,240 @@
+import argparse
+import json
+import numpy as np
+import os
+import struct
+import tempfile
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+# Binary cache of a model JSON descriptor, written next to it:
+#   magic(8) | header | metadata JSON | 16-byte aligned array blocks
+# Arrays are raw little-endian data, so they are mapped without parsing.
+# A cache is valid only while mtime and size of the JSON are unchanged.
+MAGIC = b'PGLFWMC\0'
+VERSION = 1
+HEADER = struct.Struct('<IIqqI')
+ALIGNMENT = 16
+SUFFIX = '.meshcache'
+
+# Same dtypes as load_model converts them to, so loading never copies
+ARRAY_DTYPES = {
+    'vertices': '<f4',
+    'edges': '<u4',
+    'faces': '<u4',
+    'color': '<f4',
+}
+ATTRIBUTE_DTYPE = '<f4'
+
+# Mapping a cache costs more than parsing a tiny JSON
+min_cache_size = 64 * 1024
+
+
+def cache_path(jsonpath):
+    return os.path.splitext(jsonpath)[0] + SUFFIX
+
+
+def _source_key(jsonpath):
+    st = os.stat(jsonpath)
+    return st.st_mtime_ns, st.st_size
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _split_desc(desc):
+    # Separates arrays from the rest of a descriptor
+    meta = {}
+    arrays = []
+    for key, value in desc.items():
+        if key in ARRAY_DTYPES and value is not None:
+            arrays.append(
+                (key, np.asarray(value, dtype=ARRAY_DTYPES[key]))
+            )
+        elif key == 'attributes' and value is not None:
+            for name, attr in value.items():
+                arrays.append((
+                    'attributes/' + name,
+                    np.asarray(attr, dtype=ATTRIBUTE_DTYPE)
+                ))
+        else:
+            meta[key] = value
+    return meta, arrays
+
+
+def write_cache(jsonpath, desc=None):
+    if desc is None:
+        with open(jsonpath) as f:
+            desc = json.load(f)
+
+    meta, arrays = _split_desc(desc)
+
+    table = []
+    offset = 0
+    for key, value in arrays:
+        offset = _aligned(offset)
+        table.append({
+            'key': key,
+            'dtype': value.dtype.str,
+            'shape': list(value.shape),
+            'offset': offset,
+        })
+        offset += value.nbytes
+
+    meta_bytes = json.dumps({'desc': meta, 'arrays': table}).encode()
+    data_start = _aligned(len(MAGIC) + HEADER.size + len(meta_bytes))
+    mtime_ns, size = _source_key(jsonpath)
+
+    path = cache_path(jsonpath)
+    # A temp file of its own per writer, parallel loads of the same JSON
+    # may write its cache at once and the last replace wins
+    f = tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(path) or '.',
+        prefix=os.path.basename(path) + '.',
+        suffix='.tmp',
+        delete=False
+    )
+    try:
+        with f:
+            f.write(MAGIC)
+            f.write(HEADER.pack(
+                VERSION, 0, mtime_ns, size, len(meta_bytes)
+            ))
+            f.write(meta_bytes)
+            for entry, (key, value) in zip(table, arrays):
+                f.seek(data_start + entry['offset'])
+                f.write(np.ascontiguousarray(value).tobytes())
+        os.replace(f.name, path)
+    except BaseException:
+        os.remove(f.name)
+        raise
+
+    debug('mesh cache {} is written'.format(path))
+    return path
+
+
+def read_cache(jsonpath):
+    path = cache_path(jsonpath)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        version, __, mtime_ns, size, meta_len = HEADER.unpack(
+            f.read(HEADER.size)
+        )
+        if version != VERSION or (mtime_ns, size) != _source_key(jsonpath):
+            debug('mesh cache {} is stale'.format(path))
+            return None
+        meta = json.loads(f.read(meta_len).decode())
+
+    data_start = _aligned(len(MAGIC) + HEADER.size + meta_len)
+    # Copy-on-write mapping, pages are read only when they are touched
+    mapped = np.memmap(path, dtype=np.uint8, mode='c')
+
+    desc = meta['desc']
+    for entry in meta['arrays']:
+        dtype = np.dtype(entry['dtype'])
+        count = int(np.prod(entry['shape']))
+        start = data_start + entry['offset']
+        value = np.frombuffer(
+            mapped, dtype=dtype, count=count, offset=start
+        ).reshape(entry['shape'])
+
+        key = entry['key']
+        if key.startswith('attributes/'):
+            desc.setdefault('attributes', {})[key[11:]] = value
+        else:
+            desc[key] = value
+
+    debug('mesh cache {} is loaded'.format(path))
+    return desc
+
+
+def load_desc(jsonpath, use_cache=True, build=True):
+    # Loads a model descriptor from its binary cache if it's up to date,
+    # otherwise parses the JSON and (re)builds the cache
+    use_cache = use_cache and os.path.getsize(jsonpath) >= min_cache_size
+    if use_cache:
+        try:
+            desc = read_cache(jsonpath)
+        except (OSError, ValueError) as e:
+            # Damaged cache, the JSON is parsed and the cache rebuilt
+            debug('mesh cache is not read: {}'.format(e))
+            desc = None
+        if desc is not None:
+            return desc
+
+    with open(jsonpath) as f:
+        desc = json.load(f)
+
+    if use_cache and build:
+        # Ragged or non-numeric arrays can't be cached, but the JSON
+        # descriptor is still usable as it is
+        try:
+            write_cache(jsonpath, desc)
+        except (OSError, ValueError) as e:
+            debug('mesh cache is not written: {}'.format(e))
+
+    return desc
+
+
+def build_scene(jsonpath):
+    # Prebuilds caches of all model resources of a scene JSON
+    with open(jsonpath) as f:
+        desc = json.load(f)
+
+    basepath = os.path.dirname(jsonpath)
+    written = []
+    for resource in desc.get('resources', []):
+        if resource.get('type') != 'model':
+            continue
+        filepath = resource.get('filepath')
+        if not os.path.isabs(filepath):
+            filepath = os.path.join(basepath, filepath)
+        written.append(write_cache(filepath))
+
+    return written
+
+
+def main():
+    global verbose
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--verbose', '-v',
+        action='store_true',
+        default=False,
+        help='Print debug string'
+    )
+    parser.add_argument(
+        'filepaths',
+        nargs='+',
+        help='Scene or model JSON file paths'
+    )
+
+    args = parser.parse_args()
+    verbose = args.verbose
+
+    for filepath in args.filepaths:
+        with open(filepath) as f:
+            desc = json.load(f)
+        if 'resources' in desc:
+            paths = build_scene(filepath)
+        else:
+            paths = [write_cache(filepath, desc)]
+        for path in paths:
+            print(path)
+
+
+if __name__ == '__main__':
+    main()
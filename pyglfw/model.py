@@ -7,11 +7,13 @@ import random
 from .camera import Camera
 from .light import DirectionalLight
 from .material import load_material
+from .meshcache import load_desc
 from .renderer import Renderer
 from .renderer import resource_path
 
 from OpenGL.GL import *
 from pyglfw.framework import IndexObject
+from pyglfw.framework import SeparateVertexObject
 from pyglfw.framework import VertexObject
 
 
@@ -24,7 +26,28 @@ def debug(msg):
         print(msg)
 
 
-def load_model(desc, basepath='.'):
+def draw_arrays(mode, count, instance_count=None):
+    if instance_count is None:
+        glDrawArrays(mode, 0, count)
+    else:
+        glDrawArraysInstanced(mode, 0, count, instance_count)
+
+
+def draw_elements(mode, ebo, instance_count=None):
+    if instance_count is None:
+        glDrawElements(mode, ebo.count, ebo.index_type, None)
+    else:
+        glDrawElementsInstanced(
+            mode,
+            ebo.count,
+            ebo.index_type,
+            None,
+            instance_count
+        )
+
+
+# images: optional dict of decoded material images keyed by their paths
+def load_model(desc, basepath='.', images=None):
     def _pick(key, dic, default=None):
         if key not in dic:
             return default
@@ -41,8 +64,9 @@ def load_model(desc, basepath='.'):
         return os.path.join(basepath, dic[key])
 
     vertices = _pick_nparray('vertices', desc, dtype=np.float32)
-    edges = _pick_nparray('edges', desc, dtype=np.uint16)
-    faces = _pick_nparray('faces', desc, dtype=np.uint16)
+    # IndexObject narrows them down to the smallest fitting type
+    edges = _pick_nparray('edges', desc, dtype=np.uint32)
+    faces = _pick_nparray('faces', desc, dtype=np.uint32)
     color = _pick_nparray('color', desc, dtype=np.float32)
     material_desc = _pick('material', desc)
 
@@ -51,7 +75,7 @@ def load_model(desc, basepath='.'):
     if key_attr in desc:
         attrs = desc[key_attr]
         for key, value in attrs.items():
-            attrs[key] = np.array(value, dtype=np.float32)
+            attrs[key] = np.asarray(value, dtype=np.float32)
 
     name = None
     if 'name' in desc:
@@ -68,7 +92,7 @@ def load_model(desc, basepath='.'):
 
     if material_desc is not None:
         attrs.pop('color', None)
-        material = load_material(material_desc, basepath)
+        material = load_material(material_desc, basepath, images)
         material_model = TextureModel(
             name=name,
             vertices=vertices,
@@ -82,13 +106,150 @@ def load_model(desc, basepath='.'):
     return color_model
 
 
-def load_fromjson(jsonpath):
-    with open(jsonpath) as f:
-        desc = json.load(f)
-        basepath = os.path.dirname(jsonpath)
-        return load_model(desc, basepath)
+def load_fromjson(jsonpath, use_cache=True):
+    desc = load_desc(jsonpath, use_cache=use_cache)
+    basepath = os.path.dirname(jsonpath)
+    return load_model(desc, basepath)
+
 
-    return None
+class VertexData:
+
+    # CPU side vertex data of a model. It keeps track of dirty attributes
+    # and vertex ranges, and re-writes and uploads only those of them.
+    # With interleaved=False every attribute has its own VBO, so updating
+    # an attribute never touches the others.
+    def __init__(self, usage=GL_STATIC_DRAW, interleaved=True):
+        self.usage = usage
+        self.interleaved = interleaved
+
+        self._layout = []
+        self._count = 0
+        self._buffer = None
+        self._columns = {}
+        self._vertexobj = None
+        self._dirty = {}
+
+    def mark_dirty(self, name, first=0, last=None):
+        if name in self._dirty:
+            prev_first, prev_last = self._dirty[name]
+            first = min(first, prev_first)
+            if prev_last is None or last is None:
+                last = None
+            else:
+                last = max(last, prev_last)
+        self._dirty[name] = (first, last)
+
+    # sources: list of (name, array) pairs in attribute location order.
+    # An array is shaped (vertex count, size), or (size,) for a value
+    # shared by all vertices. The first one should be 'position'.
+    def update(self, sources):
+        count = sources[0][1].shape[0]
+        layout = [(name, value.shape[-1]) for name, value in sources]
+
+        resized = layout != self._layout or count != self._count
+        if resized:
+            self._allocate(layout, count)
+            self._dirty = {name: (0, None) for name, __ in layout}
+
+        for name, value in sources:
+            if name not in self._dirty:
+                continue
+            first, last = self._dirty[name]
+            column = self._columns[name]
+            if value.ndim == 1:
+                column[first:last] = value
+            else:
+                column[first:last] = value[first:last]
+
+        if self.interleaved:
+            self._upload_interleaved(resized)
+        else:
+            self._upload_separate(resized)
+
+        self._dirty = {}
+
+    def _allocate(self, layout, count):
+        self._layout = layout
+        self._count = count
+        self._columns = {}
+
+        if self.interleaved:
+            stride = sum(width for __, width in layout)
+            self._buffer = np.empty((count, stride), dtype=np.float32)
+            offset = 0
+            for name, width in layout:
+                self._columns[name] = self._buffer[:, offset:offset + width]
+                offset += width
+        else:
+            self._buffer = None
+            for name, width in layout:
+                self._columns[name] = np.empty(
+                    (count, width),
+                    dtype=np.float32
+                )
+
+    def _upload_interleaved(self, resized):
+        vo = self._vertexobj
+        if vo is not None and \
+           isinstance(vo, VertexObject) and \
+           vo.alignment == self.alignment:
+            if resized:
+                if vo.update(self._buffer):
+                    return
+            else:
+                first, last = self._dirty_range()
+                vo.update_range(self._buffer, first, last - first)
+                return
+
+        self._vertexobj = VertexObject(
+            self._buffer,
+            self.alignment,
+            usage=self.usage
+        )
+
+    def _upload_separate(self, resized):
+        vo = self._vertexobj
+        if vo is None or \
+           not isinstance(vo, SeparateVertexObject) or \
+           vo.alignment != self.alignment:
+            self._vertexobj = SeparateVertexObject(
+                [self._columns[name] for name, __ in self._layout],
+                usage=self.usage
+            )
+            return
+
+        for i, (name, __) in enumerate(self._layout):
+            if name not in self._dirty:
+                continue
+            first, last = self._dirty[name]
+            if resized or (first == 0 and last is None):
+                vo.update_attribute(i, self._columns[name])
+            else:
+                vo.update_attribute(
+                    i,
+                    self._columns[name],
+                    first,
+                    min(last, self._count) - first
+                )
+
+    def _dirty_range(self):
+        first = min(r[0] for r in self._dirty.values())
+        last = self._count
+        if all(r[1] is not None for r in self._dirty.values()):
+            last = min(max(r[1] for r in self._dirty.values()), self._count)
+        return first, last
+
+    @property
+    def alignment(self):
+        return [width for __, width in self._layout]
+
+    @property
+    def dirty(self):
+        return len(self._dirty) > 0
+
+    @property
+    def vertexobj(self):
+        return self._vertexobj
 
 
 class ColorModel:
@@ -106,10 +267,16 @@ class ColorModel:
                  color=None, attributes=None,
                  draw_point=True,
                  point_size=gl_point_size,
-                 wireframe=False):
+                 wireframe=False,
+                 usage=GL_STATIC_DRAW,
+                 interleaved=True):
         self.name = name
+        # Buffer usage hint of VertexObject, GL_DYNAMIC_DRAW or
+        # GL_STREAM_DRAW is preferred for geometry updated every frame
+        self._vertexdata = VertexData(usage=usage, interleaved=interleaved)
         self._vertices = None
         self._color = None
+        self._color_array = None
         self._attrs = {}
         self._vertices_pending = None
         self._color_pending = None
@@ -117,7 +284,6 @@ class ColorModel:
         self.draw_point = draw_point
         self.point_size = point_size
 
-        self._vertexobj = None
         self._indexobj_edges = None
         self._indexobj_faces = None
 
@@ -142,6 +308,7 @@ class ColorModel:
 
     def prepare(self):
         self._check_ebo()
+        self._update_geometry()
 
     def draw(self, program):
         self._update_geometry()
@@ -149,28 +316,61 @@ class ColorModel:
         if self._vertexobj is None:
             return
 
+        self._draw()
+
+    def draw_instanced(self, program, instance_buffer):
+        self._update_geometry()
+
+        if self._vertexobj is None or instance_buffer.count == 0:
+            return
+
+        instance_buffer.attach(self._vertexobj)
+        self._draw(instance_buffer.count)
+
+    # Draws with the state bound through a RenderQueue, which skips the
+    # binds of whatever the previous draw has left bound
+    def draw_queued(self, queue, instance_buffer=None):
+        self._update_geometry()
+
+        if self._vertexobj is None:
+            return
+
+        instance_count = None
+        if instance_buffer is not None:
+            if instance_buffer.count == 0:
+                return
+            instance_buffer.attach(self._vertexobj)
+            instance_count = instance_buffer.count
+
+        vo = self._vertexobj
+        queue.bind_vertex_array(vo)
+        if self.draw_point:
+            queue.point_size(self.point_size)
+            draw_arrays(GL_POINTS, vo.vertex_count, instance_count)
+        if self._indexobj_edges is not None:
+            queue.bind_element_buffer(self._indexobj_edges)
+            draw_elements(GL_LINES, self._indexobj_edges, instance_count)
+        if self._indexobj_faces is not None:
+            queue.bind_element_buffer(self._indexobj_faces)
+            if self.wireframe:
+                glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            draw_elements(GL_TRIANGLES, self._indexobj_faces, instance_count)
+            if self.wireframe:
+                glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+
+    def _draw(self, instance_count=None):
         with self._vertexobj as vo:
             if self.draw_point:
                 glPointSize(self.point_size)
-                glDrawArrays(GL_POINTS, 0, vo.vertex_count)
+                draw_arrays(GL_POINTS, vo.vertex_count, instance_count)
             if self._indexobj_edges is not None:
                 with self._indexobj_edges as ebo:
-                    glDrawElements(
-                        GL_LINES,
-                        ebo.count,
-                        GL_UNSIGNED_SHORT,
-                        None
-                    )
+                    draw_elements(GL_LINES, ebo, instance_count)
             if self._indexobj_faces is not None:
                 with self._indexobj_faces as ebo:
                     if self.wireframe:
                         glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
-                    glDrawElements(
-                        GL_TRIANGLES,
-                        ebo.count,
-                        GL_UNSIGNED_SHORT,
-                        None
-                    )
+                    draw_elements(GL_TRIANGLES, ebo, instance_count)
                     if self.wireframe:
                         glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
 
@@ -189,19 +389,11 @@ class ColorModel:
     def _update_geometry(self):
         self._check_ebo()
 
-        if not self._check_pending_data():
-            return
-
-        v = self._build_data()
-
-        if self._vertexobj is not None and \
-           self._vertexobj.update(v):
+        self._check_pending_data()
+        if self.vertices is None or not self._vertexdata.dirty:
             return
 
-        self._vertexobj = VertexObject(
-            v,
-            self._alignment
-        )
+        self._vertexdata.update(self._build_sources())
 
     def _check_pending_data(self):
         pending_check = self._vertices_pending is None and \
@@ -213,6 +405,7 @@ class ColorModel:
         if self._vertices_pending is not None:
             self._vertices = self._vertices_pending
             self._vertices_pending = None
+            self._vertexdata.mark_dirty('position')
 
         # It does not make sense that color(or others) would be
         # updated without any vertices
@@ -222,47 +415,33 @@ class ColorModel:
         if self._color_pending is not None:
             self._color = self._color_pending
             self._color_pending = None
+            self._color_array = np.asarray(self._color, dtype=np.float32)
+            self._vertexdata.mark_dirty('color')
 
         if self._attrs_pending is not None:
             self._attrs = self._attrs_pending
             self._attrs_pending = None
+            for attr_name in self.ATTR_ORDER:
+                self._vertexdata.mark_dirty(attr_name)
 
         return True
 
-    def _build_data(self):
-
-        def _concat_withname(v, name):
-            if name in self.attrs:
-                return np.column_stack((v, self.attrs[name]))
-            return v
-
-        if self.color is not None:
-            self.attrs['color'] = self._get_colors(self.vertices.shape[0])
+    def _build_sources(self):
+        sources = [('position', self.vertices)]
 
-        v = self.vertices
-        if self.attrs is not None:
-            for attr_name in self.ATTR_ORDER:
-                # if attr_name == 'position':
-                #     continue
-                v = _concat_withname(v, attr_name)
-
-        return v
-
-    def _get_colors(self, num):
-        color = np.array((self.color), dtype='float32')
-        colors = np.tile(color, num).reshape((num, 3))
-        return colors
+        for attr_name in self.ATTR_ORDER:
+            if attr_name == 'color' and self._color_array is not None:
+                # Broadcast into the color column, never tiled per vertex
+                sources.append(('color', self._color_array))
+            elif self.attrs is not None and attr_name in self.attrs:
+                sources.append((attr_name, self.attrs[attr_name]))
 
-    def _concat_withcolors(self, v):
-        num = v.shape[0]
-        colors = self._get_colors(num)
-        return np.column_stack((v, colors))
+        return sources
 
-    def _concat_withattrs(self, v, attrs):
-        data = v
-        for attr in attrs:
-            data = np.column_stack((data, attr))
-        return data
+    def invalidate(self, name='position', first=0, last=None):
+        # Notifies that vertices or an attribute array has been modified
+        # in place, only rows [first, last) are uploaded again
+        self._vertexdata.mark_dirty(name, first, last)
 
     @property
     def vertices(self):
@@ -307,14 +486,16 @@ class ColorModel:
             self._color_pending = None
 
     @property
-    def _alignment(self):
-        a = [self.vertices.shape[1]]
+    def _vertexobj(self):
+        return self._vertexdata.vertexobj
 
-        for attr_name in self.ATTR_ORDER:
-            if attr_name in self.attrs:
-                a.append(self.attrs[attr_name].shape[1])
+    @property
+    def vertex_object(self):
+        return self._vertexdata.vertexobj
 
-        return a
+    @property
+    def usage(self):
+        return self._vertexdata.usage
 
     @property
     def use_material(self):
@@ -388,14 +569,16 @@ class TextureModel:
                  edges=None, faces=None,
                  attributes=None,
                  material=None,
-                 point_size=gl_point_size):
+                 point_size=gl_point_size,
+                 usage=GL_STATIC_DRAW,
+                 interleaved=True):
         self.name = name
+        self._vertexdata = VertexData(usage=usage, interleaved=interleaved)
         self._vertices = None
         self._attrs = {}
         self._vertices_pending = None
         self._attrs_pending = None
 
-        self._vertexobj = None
         self._indexobj_edges = None
         self._indexobj_faces = None
 
@@ -414,6 +597,9 @@ class TextureModel:
         if self._faces is not None and \
            self._indexobj_faces is None:
             self._indexobj_faces = IndexObject(self._faces)
+        self._update_geometry()
+        if self.material is not None:
+            self.material.prepare()
 
     def draw(self, program):
         self._update_geometry()
@@ -422,44 +608,65 @@ class TextureModel:
             return
 
         with self.material(program):
-            with self._vertexobj as vo:
-                glPointSize(self.point_size)
-                glDrawArrays(GL_POINTS, 0, vo.vertex_count)
-                if self._indexobj_edges is not None:
-                    with self._indexobj_edges as ebo:
-                        glDrawElements(
-                            GL_LINES,
-                            ebo.count,
-                            GL_UNSIGNED_SHORT,
-                            None
-                        )
-                if self._indexobj_faces is not None:
-                    with self._indexobj_faces as ebo:
-                        glDrawElements(
-                            GL_TRIANGLES,
-                            ebo.count,
-                            GL_UNSIGNED_SHORT,
-                            None
-                        )
+            self._draw()
+
+    def draw_instanced(self, program, instance_buffer):
+        self._update_geometry()
+
+        if self._vertexobj is None or instance_buffer.count == 0:
+            return
+
+        instance_buffer.attach(self._vertexobj)
+        with self.material(program):
+            self._draw(instance_buffer.count)
+
+    # Draws with the state bound through a RenderQueue, the queue binds
+    # the material before
+    def draw_queued(self, queue, instance_buffer=None):
+        self._update_geometry()
+
+        if self._vertexobj is None:
+            return
+
+        instance_count = None
+        if instance_buffer is not None:
+            if instance_buffer.count == 0:
+                return
+            instance_buffer.attach(self._vertexobj)
+            instance_count = instance_buffer.count
+
+        vo = self._vertexobj
+        queue.bind_vertex_array(vo)
+        queue.point_size(self.point_size)
+        draw_arrays(GL_POINTS, vo.vertex_count, instance_count)
+        if self._indexobj_edges is not None:
+            queue.bind_element_buffer(self._indexobj_edges)
+            draw_elements(GL_LINES, self._indexobj_edges, instance_count)
+        if self._indexobj_faces is not None:
+            queue.bind_element_buffer(self._indexobj_faces)
+            draw_elements(GL_TRIANGLES, self._indexobj_faces, instance_count)
+
+    def _draw(self, instance_count=None):
+        with self._vertexobj as vo:
+            glPointSize(self.point_size)
+            draw_arrays(GL_POINTS, vo.vertex_count, instance_count)
+            if self._indexobj_edges is not None:
+                with self._indexobj_edges as ebo:
+                    draw_elements(GL_LINES, ebo, instance_count)
+            if self._indexobj_faces is not None:
+                with self._indexobj_faces as ebo:
+                    draw_elements(GL_TRIANGLES, ebo, instance_count)
 
     def dispose(self):
         self._indexobj_edges = None
         self._indexobj_faces = None
 
     def _update_geometry(self):
-        if not self._check_pending_data():
-            return
-
-        v = self._build_data()
-
-        if self._vertexobj is not None and \
-           self._vertexobj.update(v):
+        self._check_pending_data()
+        if self.vertices is None or not self._vertexdata.dirty:
             return
 
-        self._vertexobj = VertexObject(
-            v,
-            self._alignment
-        )
+        self._vertexdata.update(self._build_sources())
 
     def _check_pending_data(self):
         pending_check = self._vertices_pending is None and \
@@ -470,6 +677,7 @@ class TextureModel:
         if self._vertices_pending is not None:
             self._vertices = self._vertices_pending
             self._vertices_pending = None
+            self._vertexdata.mark_dirty('position')
 
         # It does not make sense that color(or others) would be
         # updated without any vertices
@@ -479,30 +687,25 @@ class TextureModel:
         if self._attrs_pending is not None:
             self._attrs = self._attrs_pending
             self._attrs_pending = None
+            for attr_name in self.ATTR_ORDER:
+                self._vertexdata.mark_dirty(attr_name)
 
         return True
 
-    def _build_data(self):
-
-        def _concat_withname(v, name):
-            if name in self.attrs:
-                return np.column_stack((v, self.attrs[name]))
-            return v
+    def _build_sources(self):
+        sources = [('position', self.vertices)]
 
-        v = self.vertices
         if self.attrs is not None:
             for attr_name in self.ATTR_ORDER:
-                # if attr_name == 'position':
-                #     continue
-                v = _concat_withname(v, attr_name)
+                if attr_name in self.attrs:
+                    sources.append((attr_name, self.attrs[attr_name]))
 
-        return v
+        return sources
 
-    def _concat_withattrs(self, v, attrs):
-        data = v
-        for attr in attrs:
-            data = np.column_stack((data, attr))
-        return data
+    def invalidate(self, name='position', first=0, last=None):
+        # Notifies that vertices or an attribute array has been modified
+        # in place, only rows [first, last) are uploaded again
+        self._vertexdata.mark_dirty(name, first, last)
 
     @property
     def vertices(self):
@@ -521,14 +724,16 @@ class TextureModel:
         self._attrs_pending = value
 
     @property
-    def _alignment(self):
-        a = [self.vertices.shape[1]]
+    def _vertexobj(self):
+        return self._vertexdata.vertexobj
 
-        for attr_name in self.ATTR_ORDER:
-            if attr_name in self.attrs:
-                a.append(self.attrs[attr_name].shape[1])
+    @property
+    def vertex_object(self):
+        return self._vertexdata.vertexobj
 
-        return a
+    @property
+    def usage(self):
+        return self._vertexdata.usage
 
     @property
     def use_material(self):
@@ -0,0 +1,535 @@
+import collections
+import ctypes
+import sys
+import time
+
+import numpy as np
+
+from OpenGL.GL import *
+# The wrapped one can't allocate the 64 bit result of PyOpenGL 3.1
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v
+
+from .fbo import Framebuffer
+from .framework import IndexObject
+from .framework import InstanceMatrixBuffer
+from .framework import Program
+from .framework import SeparateVertexObject
+from .framework import Texture
+from .framework import TextureArray
+from .framework import VertexObject
+from .renderer import RendererBase
+from .renderqueue import RenderQueue
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+# Classes whose public methods, constructor and context manager are timed
+INSTRUMENTED_CLASSES = (
+    Program,
+    VertexObject,
+    SeparateVertexObject,
+    IndexObject,
+    InstanceMatrixBuffer,
+    Texture,
+    TextureArray,
+    Framebuffer,
+)
+
+# GL functions uploading client memory, see _upload_bytes
+UPLOAD_FUNCTIONS = frozenset([
+    'glBufferData',
+    'glBufferSubData',
+    'glTexImage2D',
+    'glTexImage3D',
+    'glTexSubImage2D',
+    'glTexSubImage3D',
+])
+
+# Pass of work done outside of any renderer or section
+FRAME_PASS = 'frame'
+
+
+def _pass_name(renderer):
+    return renderer.name or type(renderer).__name__
+
+
+def _client_bytes(data):
+    # None and offsets into a bound buffer are no client memory
+    if data is None or isinstance(data, (int, ctypes.c_void_p)):
+        return 0
+    if isinstance(data, np.ndarray):
+        return data.nbytes
+    if isinstance(data, ctypes.Array):
+        return ctypes.sizeof(data)
+    try:
+        return memoryview(data).nbytes
+    except TypeError:
+        return np.asarray(data).nbytes
+
+
+def _upload_bytes(name, args):
+    # Bytes of client memory an upload function reads. Pixels taken from
+    # a bound pixel unpack buffer are given as an offset and not counted,
+    # they were counted when the buffer was filled.
+    if name == 'glBufferData':
+        if len(args) == 4:
+            # (target, size, data, usage), data None only allocates
+            return 0 if args[2] is None else int(args[1])
+        # (target, data, usage) sized by PyOpenGL
+        return _client_bytes(args[1])
+    if name == 'glBufferSubData' and len(args) == 4:
+        # (target, offset, size, data)
+        return int(args[2])
+    return _client_bytes(args[-1])
+
+
+def _renderer_classes(cls=RendererBase):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _renderer_classes(subclass)
+
+
+class PassStats:
+
+    # Totals of one renderer name in one frame. cpu_time and gpu_time
+    # exclude nested passes, gpu_time is None until its queries are read.
+    # methods maps 'Class.method' to [calls, seconds].
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.cpu_time = 0.0
+        self.gpu_time = None
+        self.gl_calls = 0
+        self.uploaded_bytes = 0
+        self.gl_functions = {}
+        self.methods = {}
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'cpu_ms': self.cpu_time * 1000.0,
+            'gpu_ms': (
+                None if self.gpu_time is None else self.gpu_time * 1000.0
+            ),
+            'gl_calls': self.gl_calls,
+            'uploaded_bytes': self.uploaded_bytes,
+            'gl_functions': dict(sorted(self.gl_functions.items())),
+            'methods': {
+                name: {'calls': calls, 'ms': seconds * 1000.0}
+                for name, (calls, seconds) in sorted(self.methods.items())
+            },
+        }
+
+
+class FrameReport:
+
+    def __init__(self, frame, elapsed, passes):
+        self._frame = frame
+        self._elapsed = elapsed
+        self._passes = passes
+        self._gpu_resolved = False
+
+    def __getitem__(self, name):
+        return self._passes[name]
+
+    def __contains__(self, name):
+        return name in self._passes
+
+    def as_dict(self):
+        return {
+            'frame': self._frame,
+            'elapsed_ms': self._elapsed * 1000.0,
+            'gpu_ms': (
+                None if self.gpu_time is None else self.gpu_time * 1000.0
+            ),
+            'gl_calls': self.gl_calls,
+            'uploaded_bytes': self.uploaded_bytes,
+            'passes': {
+                name: stats.as_dict() for name, stats in self._passes.items()
+            },
+        }
+
+    def format(self):
+        lines = ['frame {}: {:.3f} ms, {} gl calls, {} bytes uploaded'
+                 .format(self._frame, self._elapsed * 1000.0,
+                         self.gl_calls, self.uploaded_bytes)]
+        for stats in sorted(self._passes.values(),
+                            key=lambda s: s.cpu_time, reverse=True):
+            gpu = '       -'
+            if stats.gpu_time is not None:
+                gpu = '{:8.3f}'.format(stats.gpu_time * 1000.0)
+            lines.append('  {:24s} {:8.3f} ms {} gpu ms {:6d} calls {:10d} '
+                         'bytes'.format(stats.name, stats.cpu_time * 1000.0,
+                                        gpu, stats.gl_calls,
+                                        stats.uploaded_bytes))
+        return '\n'.join(lines)
+
+    @property
+    def frame(self):
+        return self._frame
+
+    @property
+    def elapsed(self):
+        return self._elapsed
+
+    @property
+    def passes(self):
+        return self._passes
+
+    @property
+    def gl_calls(self):
+        return sum(s.gl_calls for s in self._passes.values())
+
+    @property
+    def uploaded_bytes(self):
+        return sum(s.uploaded_bytes for s in self._passes.values())
+
+    @property
+    def cpu_time(self):
+        return sum(s.cpu_time for s in self._passes.values())
+
+    @property
+    def gpu_resolved(self):
+        return self._gpu_resolved
+
+    @property
+    def gpu_time(self):
+        if not self._gpu_resolved:
+            return None
+        return sum(s.gpu_time or 0.0 for s in self._passes.values())
+
+
+class _Section:
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._profiler._push(self._name, None)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._profiler._pop(time.perf_counter())
+
+
+class Profiler:
+
+    # Attributes GL calls, uploaded bytes and CPU time to the renderer
+    # being rendered, keyed by its name. Nothing is wrapped until enable()
+    # and disable() puts the original functions back, so there's no cost
+    # while it's off. Calls are assumed to come from the rendering thread.
+    #
+    # gpu_timing brackets every pass with GL_TIME_ELAPSED queries. They
+    # can't nest, so a pass suspends the query of its parent and GPU time
+    # is exclusive like CPU time. Queries are read latency frames later,
+    # the report of a frame gets its gpu_time then, and window frames of
+    # them are averaged by gpu_time().
+    def __init__(self, history=120, gpu_timing=False, latency=3,
+                 window=60):
+        self._enabled = False
+        self._patched = []
+        self._reports = collections.deque(maxlen=history)
+        self._frame = 0
+        self._frame_start = None
+        self._passes = {}
+        # Entries of [name, start, nested seconds, owner]
+        self._stack = []
+
+        self._gpu_timing = gpu_timing
+        self._latency = latency
+        self._window = window
+        self._timing = False
+        self._active_query = None
+        self._free_queries = []
+        # (name, query) of the current frame, (report, segments) of frames
+        # whose queries are not read yet
+        self._segments = []
+        self._pending = collections.deque()
+        self._gpu_history = {}
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.disable()
+
+    def enable(self):
+        if self._enabled:
+            return
+        self._enabled = True
+
+        for module_name, module in list(sys.modules.items()):
+            if not module_name.startswith('pyglfw.') or module is None:
+                continue
+            if module_name == __name__:
+                continue
+            for name, func in list(vars(module).items()):
+                if not name.startswith('gl') or not callable(func):
+                    continue
+                # Null functions of missing extensions are left alone, a
+                # wrapper would pass capability checks like
+                # bool(glTexStorage2D)
+                if not func:
+                    continue
+                self._patch(module, name, self._wrap_gl(name, func))
+
+        for cls in INSTRUMENTED_CLASSES:
+            for name, func in list(vars(cls).items()):
+                if not callable(func) or isinstance(func, type):
+                    continue
+                if name.startswith('_') and \
+                   name not in ('__init__', '__enter__', '__exit__'):
+                    continue
+                self._patch(cls, name, self._wrap_method(
+                    '{}.{}'.format(cls.__name__, name), func
+                ))
+
+        # enqueue() adds draws to a RenderQueue, which submits them in
+        # runs of one renderer
+        for cls in set(_renderer_classes()):
+            for name in ('render', 'enqueue'):
+                if name in vars(cls):
+                    self._patch(cls, name, self._wrap_render(
+                        vars(cls)[name]
+                    ))
+        self._patch(RenderQueue, '_submit_run', self._wrap_run(
+            RenderQueue._submit_run
+        ))
+
+        self._timing = self._gpu_timing
+        debug('profiler wrapped {} functions'.format(len(self._patched)))
+
+    def disable(self):
+        for owner, name, func in reversed(self._patched):
+            setattr(owner, name, func)
+        self._patched = []
+        self._enabled = False
+
+        # Queries of an unfinished frame are dropped
+        self._end_segment()
+        self._frame_start = None
+        self._stack = []
+        self._timing = False
+        self._free_queries.extend(query for __, query in self._segments)
+        self._segments = []
+        self.flush()
+        if self._free_queries:
+            glDeleteQueries(len(self._free_queries), self._free_queries)
+            self._free_queries = []
+
+    # Waits for the queries of all frames and fills their reports
+    def flush(self):
+        while self._pending:
+            self._resolve(*self._pending.popleft())
+
+    # Rolling mean of GPU seconds of a pass over the last window frames
+    def gpu_time(self, name):
+        history = self._gpu_history.get(name)
+        if not history:
+            return None
+        return sum(history) / len(history)
+
+    def begin_frame(self):
+        # The open frame's queries would leak and GL_TIME_ELAPSED queries
+        # can't nest
+        if self._frame_start is not None:
+            raise RuntimeError('begin_frame() without end_frame()')
+
+        self._passes = {}
+        self._stack = [[FRAME_PASS, time.perf_counter(), 0.0, None]]
+        self._frame_start = self._stack[0][1]
+        self._segments = []
+        self._begin_segment(FRAME_PASS)
+
+    def end_frame(self):
+        if self._frame_start is None:
+            raise RuntimeError('end_frame() without begin_frame()')
+
+        now = time.perf_counter()
+        while self._stack:
+            self._pop(now)
+        report = FrameReport(self._frame, now - self._frame_start,
+                             self._passes)
+        self._reports.append(report)
+        self._frame += 1
+        self._frame_start = None
+        self._passes = {}
+
+        if self._segments:
+            self._pending.append(
+                (report, self._segments, now - report.elapsed)
+            )
+            self._segments = []
+        self._collect()
+        return report
+
+    # Times a block of work of the application as a pass of its own
+    def section(self, name):
+        return _Section(self, name)
+
+    def _patch(self, owner, name, wrapper):
+        self._patched.append((owner, name, getattr(owner, name)))
+        setattr(owner, name, wrapper)
+
+    def _stats(self):
+        name = FRAME_PASS
+        if self._stack:
+            name = self._stack[-1][0]
+        if name not in self._passes:
+            self._passes[name] = PassStats(name)
+        return self._passes[name]
+
+    def _push(self, name, owner):
+        self._end_segment()
+        self._stack.append([name, time.perf_counter(), 0.0, owner])
+        self._stats().calls += 1
+        self._begin_segment(name)
+
+    def _pop(self, now):
+        self._end_segment()
+        name, start, nested, owner = self._stack.pop()
+        elapsed = now - start
+        if name not in self._passes:
+            self._passes[name] = PassStats(name)
+        self._passes[name].cpu_time += elapsed - nested
+        if self._stack:
+            self._stack[-1][2] += elapsed
+            self._begin_segment(self._stack[-1][0])
+
+    def _begin_segment(self, name):
+        if not self._timing:
+            return
+        if self._free_queries:
+            query = self._free_queries.pop()
+        else:
+            query = int(glGenQueries(1)[0])
+        glBeginQuery(GL_TIME_ELAPSED, query)
+        self._active_query = query
+        self._segments.append((name, query))
+
+    def _end_segment(self):
+        if self._active_query is None:
+            return
+        glEndQuery(GL_TIME_ELAPSED)
+        self._active_query = None
+
+    def _collect(self):
+        # Queries of a frame are finished in order, so the last one being
+        # available means the whole frame is. Frames beyond latency are
+        # waited for, which bounds the number of queries in flight.
+        while self._pending:
+            report, segments, start = self._pending[0]
+            if len(self._pending) <= self._latency:
+                available = glGetQueryObjectuiv(
+                    segments[-1][1], GL_QUERY_RESULT_AVAILABLE
+                )
+                if not available:
+                    break
+            self._pending.popleft()
+            self._resolve(report, segments, start)
+
+    def _resolve(self, report, segments, start):
+        # A segment can't take longer than the time since its frame began.
+        # llvmpipe, for one, reports the first query of a context as if it
+        # started at zero, and such results are dropped.
+        limit = time.perf_counter() - start
+        elapsed = ctypes.c_uint64()
+        totals = {}
+        for name, query in segments:
+            glGetQueryObjectui64v(
+                query, GL_QUERY_RESULT, ctypes.byref(elapsed)
+            )
+            self._free_queries.append(query)
+            seconds = elapsed.value * 1e-9
+            if seconds > limit:
+                debug('dropped GPU time {:.3f} s of {}'.format(seconds, name))
+                continue
+            totals[name] = totals.get(name, 0.0) + seconds
+
+        for name, seconds in totals.items():
+            if name in report.passes:
+                report.passes[name].gpu_time = seconds
+            if name not in self._gpu_history:
+                self._gpu_history[name] = collections.deque(
+                    maxlen=self._window
+                )
+            self._gpu_history[name].append(seconds)
+        report._gpu_resolved = True
+
+    def _wrap_gl(self, name, func):
+        profiler = self
+        uploads = name in UPLOAD_FUNCTIONS
+
+        def _gl(*args, **kwargs):
+            stats = profiler._stats()
+            stats.gl_calls += 1
+            stats.gl_functions[name] = stats.gl_functions.get(name, 0) + 1
+            if uploads and args:
+                stats.uploaded_bytes += _upload_bytes(name, args)
+            return func(*args, **kwargs)
+        return _gl
+
+    def _wrap_method(self, key, func):
+        profiler = self
+
+        def _method(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                methods = profiler._stats().methods
+                entry = methods.setdefault(key, [0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+        return _method
+
+    def _wrap_render(self, func):
+        profiler = self
+
+        def _render(renderer, *args, **kwargs):
+            # super().render() of a subclass belongs to the same pass
+            if profiler._stack and profiler._stack[-1][3] is renderer:
+                return func(renderer, *args, **kwargs)
+            profiler._push(_pass_name(renderer), renderer)
+            try:
+                return func(renderer, *args, **kwargs)
+            finally:
+                profiler._pop(time.perf_counter())
+        return _render
+
+    def _wrap_run(self, func):
+        profiler = self
+
+        def _run(queue, renderer, *args, **kwargs):
+            if renderer is None:
+                return func(queue, renderer, *args, **kwargs)
+            profiler._push(_pass_name(renderer), renderer)
+            try:
+                return func(queue, renderer, *args, **kwargs)
+            finally:
+                profiler._pop(time.perf_counter())
+        return _run
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @property
+    def reports(self):
+        return list(self._reports)
+
+    @property
+    def last_report(self):
+        if not self._reports:
+            return None
+        return self._reports[-1]
+
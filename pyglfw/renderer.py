@@ -165,7 +165,7 @@ class RectangleRenderer(Renderer):
                 glDrawElements(
                     GL_TRIANGLES,
                     vo.element_count,
-                    GL_UNSIGNED_SHORT,
+                    vo.element_type,
                     None
                 )
 
@@ -179,13 +179,26 @@ class TextureRenderer(Renderer):
     default_vs_path = resource_path('./shader/basic_tex.vs')
     default_fs_path = resource_path('./shader/basic_tex.fs')
 
-    def __init__(self, name='', image=None):
+    # pixel_buffers: pixel unpack buffers used to stream images, see Texture
+    # format: pixel format of images, GL_BGR takes OpenCV images as they are
+    # flip_y: flips images vertically by texture coordinates instead of
+    #         reordering rows of images
+    def __init__(
+            self,
+            name='',
+            image=None,
+            pixel_buffers=0,
+            format=GL_RGB,
+            flip_y=False):
         super().__init__(
             vs_path=self.default_vs_path,
             fs_path=self.default_fs_path,
             name=name
         )
 
+        self._pixel_buffers = pixel_buffers
+        self._format = format
+        self._flip_y = flip_y
         self._image = None
         self._next_image = None
         self._vertexobj = None
@@ -203,11 +216,12 @@ class TextureRenderer(Renderer):
 
     def prepare(self):
         super().prepare()
+        bottom, top = ((0.0, 1.0), (1.0, 0.0))[self._flip_y]
         v = np.array(
-            [-1.0, -1.0, +0.0, 0.0, 0.0,
-             +1.0, -1.0, +0.0, 1.0, 0.0,
-             -1.0, +1.0, +0.0, 0.0, 1.0,
-             +1.0, +1.0, +0.0, 1.0, 1.0],
+            [-1.0, -1.0, +0.0, 0.0, bottom,
+             +1.0, -1.0, +0.0, 1.0, bottom,
+             -1.0, +1.0, +0.0, 0.0, top,
+             +1.0, +1.0, +0.0, 1.0, top],
             dtype='float32'
         )
         e = np.array(
@@ -216,7 +230,10 @@ class TextureRenderer(Renderer):
             dtype='uint16'
         )
         self._vertexobj = VertexObject(v, [3, 2], e)
-        self._texture = Texture()
+        self._texture = Texture(
+            format=self._format,
+            pixel_buffers=self._pixel_buffers
+        )
 
     def render(self):
         if self._next_image is not None:
@@ -232,7 +249,7 @@ class TextureRenderer(Renderer):
                     glDrawElements(
                         GL_TRIANGLES,
                         vo.element_count,
-                        GL_UNSIGNED_SHORT,
+                        vo.element_type,
                         None
                     )
 
@@ -0,0 +1,269 @@
+import itertools
+
+import numpy as np
+
+from OpenGL.GL import *
+
+
+verbose = False
+
+
+def debug(msg):
+    if verbose:
+        print(msg)
+
+
+# Fields of sort keys from the most significant 16 bits down. Programs,
+# materials and vertex arrays are numbered densely per frame, so they only
+# collide beyond 65536 distinct values in a frame.
+STATE_ORDER = ('program', 'material', 'vertex_array', 'depth')
+FRONT_TO_BACK_ORDER = ('depth', 'program', 'material', 'vertex_array')
+
+KEY_FIELD_BITS = 16
+KEY_FIELD_MASK = (1 << KEY_FIELD_BITS) - 1
+
+BIND_KINDS = (
+    'program',
+    'material',
+    'vertex_array',
+    'element_buffer',
+    'texture',
+    'point_size',
+)
+
+
+def _dense_ids(values):
+    # Numbers values in the order they first appear
+    ids = {}
+    return np.array(
+        [ids.setdefault(value, len(ids)) for value in values],
+        dtype=np.uint64
+    )
+
+
+class RenderQueue:
+
+    # Collects the draws of all renderers of a frame, sorts them by a 64
+    # bit key packing program, material, vertex array and depth, then
+    # submits them skipping binds of state which is already bound.
+    # Equal keys keep the order they were added in.
+    #
+    # front_to_back moves depth to the top of the key, so that opaque
+    # geometry nearest to the camera is drawn first and hides the rest
+    # from fragment shading, at the cost of more binds.
+    #
+    # Sorted draws are submitted in runs of consecutive draws of the same
+    # renderer, so that a Profiler attributes them to it.
+    def __init__(self, front_to_back=False):
+        self.front_to_back = front_to_back
+        # World to view matrix (pyrr layout) depth is measured with
+        self.view_matrix = None
+
+        self._items = []
+        self._setups = {}
+        self._reset_state()
+        self.reset_stats()
+
+    def add(self, program, model, matrix=None, instance_buffer=None,
+            positions=None, setup=None, renderer=None):
+        # matrix: model matrix set before drawing a single instance
+        # instance_buffer: InstanceMatrixBuffer drawing instances at once
+        # positions: (N, 3) world positions of the instances, the nearest
+        #            one gives the depth. Taken from matrix if not given.
+        # setup: called with program when it's bound the first time in a
+        #        frame, to set per frame uniforms
+        # renderer: renderer the draw belongs to
+        if positions is None:
+            if matrix is not None:
+                positions = matrix[3:, :3]
+            else:
+                positions = np.zeros((1, 3), dtype=np.float32)
+
+        material = None
+        if model.use_material:
+            material = model.material
+
+        self._items.append((
+            program, model, material, matrix, instance_buffer,
+            np.asarray(positions, dtype=np.float32).reshape(-1, 3),
+            renderer
+        ))
+        if setup is not None and program not in self._setups:
+            self._setups[program] = setup
+
+    def clear(self):
+        self._items = []
+        self._setups = {}
+
+    def sort_keys(self):
+        if not self._items:
+            return np.zeros(0, dtype=np.uint64)
+
+        fields = {
+            'program': _dense_ids(item[0] for item in self._items),
+            'material': _dense_ids(item[2] for item in self._items),
+            'vertex_array': _dense_ids(
+                self._vertex_array_id(item[1]) for item in self._items
+            ),
+            'depth': self._depths(),
+        }
+
+        order = (STATE_ORDER, FRONT_TO_BACK_ORDER)[self.front_to_back]
+        keys = np.zeros(len(self._items), dtype=np.uint64)
+        for name in order:
+            keys = (keys << np.uint64(KEY_FIELD_BITS)) | \
+                   (fields[name] & np.uint64(KEY_FIELD_MASK))
+        return keys
+
+    def submit(self):
+        if not self._items:
+            return
+
+        items = [
+            self._items[index]
+            for index in np.argsort(self.sort_keys(), kind='stable')
+        ]
+        prepared = set()
+        for renderer, run in itertools.groupby(items, lambda item: item[6]):
+            self._submit_run(renderer, list(run), prepared)
+
+        self._restore()
+        self.clear()
+
+    # Draws a run of sorted items of one renderer. prepared holds the
+    # programs whose setup is done in this frame.
+    def _submit_run(self, renderer, items, prepared):
+        for item in items:
+            program, model, material, matrix, instance_buffer = item[:5]
+
+            self.use_program(program)
+            if program not in prepared:
+                prepared.add(program)
+                setup = self._setups.get(program)
+                if setup is not None:
+                    setup(program)
+
+            if material is not None:
+                self.bind_material(material)
+            if matrix is not None:
+                program.setMatrix4('model', matrix)
+
+            model.draw_queued(self, instance_buffer)
+            self._draws += 1
+
+    def use_program(self, program):
+        if self._count('program', program is self._program):
+            return
+        glUseProgram(program.id)
+        self._program = program
+        # Material uniforms are kept per program
+        self._material = None
+
+    def bind_material(self, material):
+        if self._count('material', material is self._material):
+            return
+        material.update(self._program, queue=self)
+        self._material = material
+
+    def bind_vertex_array(self, vertexobj):
+        if self._count('vertex_array', vertexobj.vao == self._vertex_array):
+            return
+        glBindVertexArray(vertexobj.vao)
+        self._vertex_array = vertexobj.vao
+        # Element buffer binding is a state of the vertex array
+        self._element_buffer = None
+
+    def bind_element_buffer(self, indexobj):
+        if self._count('element_buffer',
+                       indexobj.id == self._element_buffer):
+            return
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, indexobj.id)
+        self._element_buffer = indexobj.id
+
+    def bind_texture(self, texture):
+        binding = (texture.target, texture.id)
+        if self._count('texture',
+                       self._textures.get(texture.unit) == binding):
+            return
+        if texture.unit != self._active_texture:
+            glActiveTexture(texture.unit)
+            self._active_texture = texture.unit
+        glBindTexture(texture.target, texture.id)
+        self._textures[texture.unit] = binding
+
+    def point_size(self, size):
+        if self._count('point_size', size == self._point_size):
+            return
+        glPointSize(size)
+        self._point_size = size
+
+    def reset_stats(self):
+        self._binds = dict.fromkeys(BIND_KINDS, 0)
+        self._skipped = dict.fromkeys(BIND_KINDS, 0)
+        self._draws = 0
+
+    def _count(self, kind, bound):
+        # Returns True if the bind is redundant
+        if bound:
+            self._skipped[kind] += 1
+        else:
+            self._binds[kind] += 1
+        return bound
+
+    def _reset_state(self):
+        self._program = None
+        self._material = None
+        self._vertex_array = None
+        self._element_buffer = None
+        self._active_texture = None
+        self._textures = {}
+        self._point_size = None
+
+    def _restore(self):
+        # Leaves the bindings as the renderers do after drawing
+        glBindVertexArray(0)
+        for unit, (target, __) in self._textures.items():
+            glActiveTexture(unit)
+            glBindTexture(target, 0)
+        glActiveTexture(GL_TEXTURE0)
+        glUseProgram(0)
+        self._reset_state()
+
+    def _vertex_array_id(self, model):
+        vertexobj = model.vertex_object
+        if vertexobj is None:
+            return 0
+        return vertexobj.vao
+
+    def _depths(self):
+        count = len(self._items)
+        if self.view_matrix is None:
+            return np.zeros(count, dtype=np.uint64)
+
+        positions = [item[5] for item in self._items]
+        points = np.concatenate(positions)
+        view = np.asarray(self.view_matrix, dtype=np.float32)
+        # Row vectors as pyrr does, the camera looks down -z
+        depth = -(points @ view[:3, 2] + view[3, 2])
+        starts = np.cumsum([0] + [len(p) for p in positions[:-1]])
+        nearest = np.minimum.reduceat(depth, starts)
+
+        near, far = nearest.min(), nearest.max()
+        scale = KEY_FIELD_MASK / max(far - near, 1e-6)
+        return ((nearest - near) * scale).astype(np.uint64)
+
+    @property
+    def binds(self):
+        return dict(self._binds)
+
+    @property
+    def skipped_binds(self):
+        return dict(self._skipped)
+
+    @property
+    def draws(self):
+        return self._draws
+
+    @property
+    def size(self):
+        return len(self._items)
@@ -3,11 +3,17 @@ import math
 import numpy as np
 import os
 import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
 
 from .camera import Camera
 from .camera import load_camera
 from .instance import ModelInstance
 from .light import load_light
+from .material import decode_image
+from .material import image_paths
+from .meshcache import load_desc
 from .model import load_model
 from .renderer import RendererBase
 from .rendererman import RendererManager
@@ -25,14 +31,27 @@ def debug(msg):
         print(msg)
 
 
-def load_resources(resources_dic, basepath='.'):
+# CPU phase of scene loading. Parsing descriptors, decoding material
+# images and building models need no GL context, so they are spread over
+# a thread pool of 'workers' threads (None for the default, 1 for none).
+# GL objects are created later by prepare() on the render thread.
+def load_resources(
+        resources_dic,
+        basepath='.',
+        use_cache=True,
+        workers=None,
+        timings=None):
     def _pick(dic, key):
         if key not in dic:
             return None
         return dic[key]
 
+    if timings is None:
+        timings = {}
+
     resource_list = {}
     model_list = {}
+    model_paths = []
 
     for i in resources_dic:
         resource_type = _pick(i, 'type')
@@ -41,12 +60,47 @@ def load_resources(resources_dic, basepath='.'):
         if os.path.isabs(filepath) is False:
             filepath = os.path.join(basepath, filepath)
 
-        with open(filepath) as f:
-            desc = json.load(f)
-
         if resource_type == 'model':
-            model = load_model(desc, basepath)
-            model_list[model.name] = model
+            model_paths.append(filepath)
+
+    executor = None
+    _map = map
+    if workers is None or workers > 1:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        _map = executor.map
+
+    try:
+        start = time.perf_counter()
+        descs = list(_map(
+            lambda path: load_desc(path, use_cache=use_cache),
+            model_paths
+        ))
+        timings['parse'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        decode_paths = []
+        for desc in descs:
+            material_desc = _pick(desc, 'material')
+            if material_desc is None:
+                continue
+            for path in image_paths(material_desc, basepath):
+                if path not in decode_paths:
+                    decode_paths.append(path)
+        images = dict(zip(decode_paths, _map(decode_image, decode_paths)))
+        timings['decode'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        models = list(_map(
+            lambda desc: load_model(desc, basepath, images),
+            descs
+        ))
+        timings['build'] = time.perf_counter() - start
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for model in models:
+        model_list[model.name] = model
 
     resource_list['model'] = model_list
 
@@ -112,10 +166,21 @@ def load_lights(lights_desc):
     return light_list
 
 
-def load_fromjson(jsonpath):
+def load_fromjson(jsonpath, use_cache=True, workers=None):
     with open(jsonpath) as f:
         desc = json.load(f)
 
+    return load_fromdesc(
+        desc,
+        os.path.dirname(jsonpath),
+        use_cache=use_cache,
+        workers=workers
+    )
+
+
+# Builds a scene from a descriptor in the scene JSON format, relative
+# resource paths are resolved from basepath
+def load_fromdesc(desc, basepath='.', use_cache=True, workers=None):
     def _pick(dic, key):
         if key not in dic:
             return None
@@ -127,13 +192,15 @@ def load_fromjson(jsonpath):
     instances_desc = _pick(desc, 'instances')
     camera_desc = _pick(desc, 'camera')
 
-    basepath = os.path.dirname(jsonpath)
-
     debug(f'name: {name}')
 
+    timings = {}
     resource_list = load_resources(
         resources_desc,
-        basepath
+        basepath,
+        use_cache=use_cache,
+        workers=workers,
+        timings=timings
     )
     debug(f'resources:\n{resource_list}\n')
 
@@ -155,13 +222,15 @@ def load_fromjson(jsonpath):
         instances=instance_list,
         lights=light_list
     )
+    scene.timings.update(timings)
     debug(f'scene: {scene}\n')
+    debug(f'timings: {timings}\n')
 
     return scene
 
 
-def test_json(jsonpath):
-    scene = load_fromjson(jsonpath)
+def test_json(jsonpath, workers=None):
+    scene = load_fromjson(jsonpath, workers=workers)
 
     app = QApplication(sys.argv)
     w = GLWidget()
@@ -179,13 +248,20 @@ class Scene(RendererBase):
             name='scene',
             camera=None,
             instances={},
-            lights=[]):
+            lights=[],
+            render_queue=None):
         self._renderer_man = RendererManager()
 
         self.name = name
         self.camera = camera
         self.instances = instances
         self.lights = lights
+        # RenderQueue sorting the draws of all renderers to skip redundant
+        # binds, None renders every renderer in turn
+        self.render_queue = render_queue
+        # Seconds spent for each loading phase, parse/decode/build on
+        # loading and prepare on the render thread
+        self.timings = {}
 
         for i in self.instances.values():
             renderer = self._renderer_man.get_renderer(i.renderer_spec)
@@ -194,8 +270,11 @@ class Scene(RendererBase):
             renderer.lights = lights
 
     def prepare(self):
+        start = time.perf_counter()
         for r in self._renderer_man.renderers:
             r.prepare()
+        self.timings['prepare'] = time.perf_counter() - start
+        debug(f'timings: {self.timings}\n')
 
     def reshape(self, w, h):
         glViewport(0, 0, w, h)
@@ -203,8 +282,24 @@ class Scene(RendererBase):
             r.reshape(w, h)
 
     def render(self):
+        queue = self.render_queue
+        if queue is None:
+            for r in self._renderer_man.renderers:
+                r.render()
+            return
+
+        # Draws are only sorted between renderers without enqueue(), the
+        # queue is submitted before each of them so that they still draw
+        # after the renderers listed before them
+        if self.camera is not None:
+            queue.view_matrix = self.camera.view_matrix
         for r in self._renderer_man.renderers:
-            r.render()
+            if hasattr(r, 'enqueue'):
+                r.enqueue(queue)
+            else:
+                queue.submit()
+                r.render()
+        queue.submit()
 
     def dispose(self):
         for r in self._renderer_man.renderers:
@@ -229,13 +324,19 @@ def main():
         required=True,
         help='Model JSON file path'
     )
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=None,
+        help='Number of threads loading resources'
+    )
 
     args = parser.parse_args()
 
     verbose = args.verbose
     filepath = args.filepath
 
-    test_json(filepath)
+    test_json(filepath, workers=args.workers)
 
 
 if __name__ == '__main__':
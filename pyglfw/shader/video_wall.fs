@@ -0,0 +1,11 @@
+#version 330 core
+
+in vec3 TexCoord;
+out vec4 color;
+
+uniform sampler2DArray input_textures;
+
+void main()
+{
+  color = texture(input_textures, TexCoord);
+}
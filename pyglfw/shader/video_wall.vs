@@ -0,0 +1,23 @@
+#version 330 core
+
+// Unit quad, each instance is a tile and a layer of the texture array
+layout (location = 0) in vec4 position;
+layout (location = 1) in vec2 texcoords;
+
+out vec3 TexCoord;
+
+uniform int columns;
+uniform int rows;
+
+void main()
+{
+    int column = gl_InstanceID % columns;
+    int row = gl_InstanceID / columns;
+    vec2 size = vec2(2.0 / float(columns), 2.0 / float(rows));
+    // The first tile is at the top left
+    vec2 origin = vec2(-1.0 + float(column) * size.x,
+                       1.0 - float(row + 1) * size.y);
+
+    gl_Position = vec4(origin + position.xy * size, 0.0, 1.0);
+    TexCoord = vec3(texcoords, float(gl_InstanceID));
+}
@@ -1,20 +1,62 @@
 import cv2
 import numpy as np
+import queue
 import time
 
+from OpenGL.GL import *
 from threading import Thread
 from threading import Condition
 # Sync using Condition causes critical performance down
 # from threading import Condition
 
+from .framework import TextureArray
+from .framework import VertexObject
+from .renderer import Renderer
 from .renderer import TextureRenderer
+from .renderer import resource_path
 
 
-class FrameProvider:
+class FrameSource:
+
+    # Frame available listeners are called as listener(sequence), from
+    # the capture thread for threaded sources. End listeners are called
+    # as listener() when a source stops itself at the end of its stream.
+    def __init__(self):
+        self._listeners = []
+        self._end_listeners = []
+
+    def add_listener(self, listener):
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def add_end_listener(self, listener):
+        if listener not in self._end_listeners:
+            self._end_listeners.append(listener)
+
+    def remove_end_listener(self, listener):
+        if listener in self._end_listeners:
+            self._end_listeners.remove(listener)
+
+    def _notify(self, sequence):
+        for listener in tuple(self._listeners):
+            listener(sequence)
+
+    def _notify_end(self):
+        for listener in tuple(self._end_listeners):
+            listener()
+
+
+class FrameProvider(FrameSource):
 
     def __init__(self, srcpath=None):
+        super().__init__()
         self._img = None
         self._srcpath = None
+        self._sequence = 0
 
         self.srcpath = srcpath
 
@@ -33,6 +75,12 @@ class FrameProvider:
                     left=0, right=rb,
                     borderType=cv2.BORDER_REPLICATE
                 )
+        self._sequence += 1
+        self._notify(self._sequence)
+
+    # Same interface as Webcam.read, a new sequence per loaded image
+    def read(self):
+        return self._sequence, self._img
 
     @property
     def frame(self):
@@ -68,10 +116,125 @@ class FrameProvider:
         return 0.0
 
 
-class Webcam:
+class FrameRing:
+
+    # Preallocated frame slots shared by writer threads and one consumer
+    # without a lock. A slot is published by a single assignment of
+    # (slot, sequence) after the frame is written. Writers never reuse the
+    # published slot, the slot held by the consumer or slots acquired but
+    # not published yet, so a frame is never overwritten while it's read.
+    def __init__(self, size=3):
+        # Published, held and writing slots need to be distinct
+        size = max(size, 3)
+        self._slots = [None] * size
+        self._views = [None] * size
+        self._published = (-1, 0)
+        self._held = -1
+        self._pending = set()
+        self._next = 0
+        self._consumed = 0
+        self._dropped = 0
+        self._late = 0
+
+    # Reserves a free slot until it's published or released
+    def acquire(self):
+        size = len(self._slots)
+        slot = self._next
+        for __ in range(size):
+            if slot != self._published[0] and \
+               slot != self._held and \
+               slot not in self._pending:
+                break
+            slot = (slot + 1) % size
+        else:
+            raise RuntimeError('No free frame slot')
+
+        self._pending.add(slot)
+        self._next = (slot + 1) % size
+        return slot
+
+    def release(self, slot):
+        self._pending.discard(slot)
+
+    # Reads a frame from cv2.VideoCapture into an acquired slot
+    def read_into(self, slot, cap):
+        succeed, image = cap.read(self._slots[slot])
+        if not succeed or image is None:
+            return False
+
+        # cv2 returns a new array only when the frame size is changed
+        if image is not self._slots[slot]:
+            self._slots[slot] = image
+            view = image.view()
+            view.flags.writeable = False
+            self._views[slot] = view
+        return True
+
+    def publish(self, slot):
+        previous = self._published[1]
+        if previous > self._consumed:
+            self._dropped += 1
+        self._published = (slot, previous + 1)
+        self._pending.discard(slot)
+
+    # Reads a frame from cv2.VideoCapture and publishes it
+    def capture(self, cap):
+        slot = self.acquire()
+        if not self.read_into(slot, cap):
+            self.release(slot)
+            return False
+        self.publish(slot)
+        return True
+
+    # Returns (sequence, read-only frame) of the latest frame, the frame
+    # stays valid until the next read
+    def read(self):
+        while True:
+            published = self._published
+            slot, sequence = published
+            self._held = slot
+            # The writer may have moved on before the slot was held. The
+            # sequence is compared too, writers wrapping around the ring
+            # may publish the same slot again with a newer frame.
+            if self._published == published:
+                break
+
+        if slot < 0:
+            return 0, None
+        if sequence == self._consumed:
+            self._late += 1
+        self._consumed = sequence
+        return sequence, self._views[slot]
 
-    def __init__(self):
-        self._img = None
+    @property
+    def sequence(self):
+        return self._published[1]
+
+    # Copy of the latest frame. The copy is taken through read() while the
+    # slot is held, so it counts as a read of the consumer.
+    @property
+    def frame(self):
+        __, frame = self.read()
+        if frame is None:
+            return None
+        return frame.copy()
+
+    # Frames overwritten before the consumer read them
+    @property
+    def dropped_frames(self):
+        return self._dropped
+
+    # Reads that found no frame newer than the previous read
+    @property
+    def late_frames(self):
+        return self._late
+
+
+class Webcam(FrameSource):
+
+    def __init__(self, ring_size=3):
+        super().__init__()
+        self._ring = FrameRing(ring_size)
         self._run = False
         self._cap = None
         self._cap_cond = Condition()
@@ -81,7 +244,7 @@ class Webcam:
     def _load(self):
         with self._cap_cond as cond:
             self._cap = cv2.VideoCapture(0)
-            __, self._img = self._cap.read()
+            self._ring.capture(self._cap)
             self._cap_cond.notifyAll()
 
     # Create thread for capturing image
@@ -109,16 +272,36 @@ class Webcam:
                 self._cap_cond.wait()
 
         while self._run:
-            succeed, temp_frame = self._cap.read()
+            succeed = self._ring.capture(self._cap)
             if succeed:
-                self._img = temp_frame
-            self._run = self._run and succeed
+                self._notify(self._ring.sequence)
+            elif self._run:
+                self._run = False
+                self._notify_end()
+
+    # Returns (sequence, frame), the sequence is unchanged until a new frame
+    # is captured so consumers can skip redundant work
+    def read(self):
+        return self._ring.read()
 
     @property
     def frame(self):
-        # Copy may cause some problems about performance
-        # return self._img
-        return np.copy(self._img)
+        # Copy of the latest frame, which stays intact while the capture
+        # thread goes on. read() avoids the copy, its frame is valid only
+        # until the next read.
+        return self._ring.frame
+
+    @property
+    def sequence(self):
+        return self._ring.sequence
+
+    @property
+    def dropped_frames(self):
+        return self._ring.dropped_frames
+
+    @property
+    def late_frames(self):
+        return self._ring.late_frames
 
     @property
     def run(self):
@@ -145,18 +328,41 @@ class Webcam:
 
     def __del__(self):
         self.stop()
-        self._cap.release()
+        if self._cap is not None:
+            self._cap.release()
 
 
 class VideoPlayer(Webcam):
 
-    def __init__(self, srcpath=None):
+    # A decoding thread fills a bounded queue ahead of a presenting thread
+    # which publishes each frame when the playback clock reaches its
+    # presentation timestamp. Frames later than one frame interval are
+    # skipped to keep up with the clock.
+    # queue_size: number of frames decoded ahead
+    def __init__(self, srcpath=None, queue_size=4):
         # FIXME: Eliminate duplications
-        self._img = None
+        FrameSource.__init__(self)
+        # Queued frames, a frame being decoded and a frame being presented
+        # are reserved besides the published and the held one
+        self._ring = FrameRing(queue_size + 4)
+        self._queue = queue.Queue(queue_size)
         self._run = False
         self._srcpath = None
         self._cap = None
         self._cap_cond = Condition()
+        self._threads = []
+
+        self._fps = 0.0
+        self._frame_count = 0
+        self._position = 0.0
+        self._rate = 1.0
+        # (wall time, media time, rate) the playback clock is anchored to
+        self._clock = None
+        # Bumped by seek to discard frames decoded before it
+        self._generation = 0
+        self._seek_to = None
+        self._next_item = None
+        self._skipped = 0
 
         self.srcpath = srcpath
 
@@ -164,9 +370,212 @@ class VideoPlayer(Webcam):
         if self.srcpath is not None:
             with self._cap_cond as cond:
                 self._cap = cv2.VideoCapture(self.srcpath)
-                __, self._img = self._cap.read()
+                self._fps = self._cap.get(cv2.CAP_PROP_FPS)
+                self._frame_count = self._cap.get(cv2.CAP_PROP_FRAME_COUNT)
+                self._flush()
+                self._present_first()
                 self._cap_cond.notifyAll()
 
+    def start(self):
+        if self.run or self._cap is None:
+            return
+
+        self._run = True
+        self._clock = None
+        self._threads = [
+            Thread(target=self._decode, args=()),
+            Thread(target=self._present, args=()),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        if not self.run:
+            return
+
+        self._run = False
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    # Moves to the first frame at or after position (seconds)
+    def seek(self, position):
+        self._generation += 1
+        if self.run:
+            self._seek_to = (self._generation, position)
+        elif self._cap is not None:
+            self._flush()
+            self._cap.set(cv2.CAP_PROP_POS_MSEC, position * 1000.0)
+            self._present_first(position)
+
+    def _flush(self):
+        items = [self._next_item]
+        self._next_item = None
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for item in items:
+            if item is not None and item[1] >= 0:
+                self._ring.release(item[1])
+
+    def _decode_frame(self, skip_until=None):
+        # Returns (slot, pts) of the next frame, slot is -1 at the end
+        while True:
+            slot = self._ring.acquire()
+            if not self._ring.read_into(slot, self._cap):
+                self._ring.release(slot)
+                return -1, self._position
+
+            pts = self._cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            # Seeking may land on a key frame before the target
+            if skip_until is not None and \
+               pts < skip_until - 0.5 * self.frame_interval:
+                self._ring.release(slot)
+                continue
+            return slot, pts
+
+    def _present_first(self, skip_until=None):
+        slot, pts = self._decode_frame(skip_until)
+        if slot >= 0:
+            self._ring.publish(slot)
+            self._position = pts
+            self._notify(self._ring.sequence)
+
+    def _decode(self):
+        generation = self._generation
+        while self._run:
+            skip_until = None
+            request = self._seek_to
+            if request is not None and request[0] > generation:
+                generation, skip_until = request
+                self._cap.set(cv2.CAP_PROP_POS_MSEC, skip_until * 1000.0)
+
+            slot, pts = self._decode_frame(skip_until)
+            item = (generation, slot, pts)
+            queued = False
+            while self._run and generation == self._generation:
+                try:
+                    self._queue.put(item, timeout=0.01)
+                    queued = True
+                    break
+                except queue.Full:
+                    continue
+
+            if not queued:
+                if slot >= 0:
+                    self._ring.release(slot)
+                continue
+
+            # The end of the stream waits for a seek or stop
+            while slot < 0 and self._run and \
+                    generation == self._generation:
+                time.sleep(0.01)
+
+    def _present(self):
+        generation = None
+        while self._run:
+            # A frame interrupted by stop is presented first on restart
+            item, self._next_item = self._next_item, None
+            if item is None:
+                try:
+                    item = self._queue.get(timeout=0.01)
+                except queue.Empty:
+                    continue
+
+            if item[0] != self._generation:
+                if item[1] >= 0:
+                    self._ring.release(item[1])
+                continue
+            if item[1] < 0:
+                self._run = False
+                self._notify_end()
+                break
+
+            # The clock restarts from the first frame after start or seek
+            if self._clock is None or item[0] != generation:
+                generation = item[0]
+                self._clock = (time.perf_counter(), item[2], self._rate)
+
+            if not self._wait_until(item):
+                if not self._run and item[0] == self._generation:
+                    self._next_item = item
+                else:
+                    self._ring.release(item[1])
+                continue
+
+            self._ring.publish(item[1])
+            self._position = item[2]
+            self._notify(self._ring.sequence)
+
+        self._clock = None
+
+    def _wait_until(self, item):
+        # Returns False if the frame is discarded by seek, stop or being
+        # later than a frame interval
+        while self._run and item[0] == self._generation:
+            delay = self._due(item[2]) - time.perf_counter()
+            if delay > 0.0:
+                time.sleep(min(delay, 0.01))
+                continue
+
+            if -delay > self.frame_interval / self._rate > 0.0:
+                self._skipped += 1
+                return False
+            return True
+        return False
+
+    def _due(self, pts):
+        start, media_time, rate = self._clock
+        return start + (pts - media_time) / rate
+
+    @property
+    def position(self):
+        # Presentation timestamp of the latest frame in seconds
+        return self._position
+
+    @position.setter
+    def position(self, value):
+        self.seek(value)
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @rate.setter
+    def rate(self, value):
+        if value <= 0.0:
+            raise ValueError('rate should be positive')
+        clock = self._clock
+        if clock is not None:
+            # Rebase the clock so that the current media time is kept
+            now = time.perf_counter()
+            media_time = clock[1] + (now - clock[0]) * clock[2]
+            self._clock = (now, media_time, value)
+        self._rate = value
+
+    @property
+    def duration(self):
+        if self._fps > 0.0:
+            return self._frame_count / self._fps
+        return 0.0
+
+    @property
+    def fps(self):
+        return self._fps
+
+    @property
+    def frame_interval(self):
+        if self._fps > 0.0:
+            return 1.0 / self._fps
+        return 0.0
+
+    # Frames skipped because they were late for the clock
+    @property
+    def skipped_frames(self):
+        return self._skipped
+
     @property
     def srcpath(self):
         return self._srcpath
@@ -184,19 +593,229 @@ class VideoRenderer(TextureRenderer):
                  name='',
                  image=None,
                  video_source=None,
-                 frame_block=None):
-        super().__init__(name=name, image=image)
+                 frame_block=None,
+                 pixel_buffers=2):
+        # Frames are uploaded as BGR and flipped by texture coordinates,
+        # so they reach the GPU without being copied
+        super().__init__(
+            name=name,
+            image=image,
+            pixel_buffers=pixel_buffers,
+            format=GL_BGR,
+            flip_y=True
+        )
 
         self.video_source = video_source
         self.frame_block = frame_block
+        self._sequence = 0
 
     def render(self):
-        image = self.video_source.frame
-        if image is not None:
+        # Only a frame newer than the uploaded one is processed
+        sequence, image = self.video_source.read()
+        if image is not None and sequence != self._sequence:
+            self._sequence = sequence
             if self.frame_block:
                 image = self.frame_block(image)
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            image = image[::-1, ...]
             self.image = image
 
         super().render()
+
+    def dispose(self):
+        super().dispose()
+        self._sequence = 0
+
+
+class VideoWallRenderer(Renderer):
+
+    default_vs_path = resource_path('./shader/video_wall.vs')
+    default_fs_path = resource_path('./shader/video_wall.fs')
+
+    # Draws frames of many sources as a grid of tiles with one texture
+    # array and one instanced draw. Frames are uploaded as BGR into the
+    # layer of their source, resized only if they don't fit the tile.
+    # columns: tiles per row, a square grid if None
+    def __init__(
+            self,
+            name='',
+            sources=None,
+            tile_width=320,
+            tile_height=240,
+            columns=None):
+        super().__init__(
+            vs_path=self.default_vs_path,
+            fs_path=self.default_fs_path,
+            name=name
+        )
+
+        self._tile_width = tile_width
+        self._tile_height = tile_height
+        self._columns = columns
+        self._sources = []
+        self._streams = []
+        self._textures = None
+        self._vertexobj = None
+
+        for source in sources or []:
+            self.add_source(source)
+
+    def add_source(self, source):
+        stream = {
+            'sequence': 0,
+            'uploads': 0,
+            'produced': (0, 0.0),
+            'frame_time': 0.0,
+            'latency': 0.0,
+            'scratch': None,
+        }
+
+        # Production time of frames, notified by capture threads
+        def _on_frame(sequence):
+            stream['produced'] = (sequence, time.perf_counter())
+
+        stream['listener'] = _on_frame
+        source.add_listener(_on_frame)
+        self._sources.append(source)
+        self._streams.append(stream)
+
+    def remove_source(self, source):
+        index = self._sources.index(source)
+        source.remove_listener(self._streams[index]['listener'])
+        del self._sources[index]
+        del self._streams[index]
+        # Layers are shifted, so every stream is uploaded again
+        for stream in self._streams:
+            stream['sequence'] = 0
+
+    def prepare(self):
+        super().prepare()
+        v = np.array(
+            [+0.0, +0.0, +0.0, 0.0, 1.0,
+             +1.0, +0.0, +0.0, 1.0, 1.0,
+             +0.0, +1.0, +0.0, 0.0, 0.0,
+             +1.0, +1.0, +0.0, 1.0, 0.0],
+            dtype='float32'
+        )
+        e = np.array(
+            [0, 1, 2,
+             1, 3, 2],
+            dtype='uint16'
+        )
+        self._vertexobj = VertexObject(v, [3, 2], e)
+        self._textures = None
+
+    def render(self):
+        count = len(self._sources)
+        if count == 0:
+            return
+
+        if self._textures is None or self._textures.layers < count:
+            self._textures = TextureArray(
+                self._tile_width, self._tile_height, count,
+                format=GL_BGR
+            )
+            for stream in self._streams:
+                stream['sequence'] = 0
+
+        for layer, source in enumerate(self._sources):
+            self._upload(layer, source)
+
+        columns, rows = self.grid
+        with self._program as program:
+            with self._vertexobj as vo:
+                with self._textures as tex:
+                    program.setInt('input_textures', tex.unit_number)
+                    program.setInt('columns', columns)
+                    program.setInt('rows', rows)
+                    glDrawElementsInstanced(
+                        GL_TRIANGLES,
+                        vo.element_count,
+                        vo.element_type,
+                        None,
+                        count
+                    )
+
+    def _upload(self, layer, source):
+        stream = self._streams[layer]
+        sequence, image = source.read()
+        if image is None or sequence == stream['sequence']:
+            return
+
+        # The layers are allocated as BGR, other layouts would be read
+        # with the wrong stride
+        if image.ndim != 3 or image.shape[2] != 3:
+            raise ValueError(
+                'Expected a BGR frame, got shape {}'.format(image.shape)
+            )
+
+        if image.shape[1] != self._tile_width or \
+           image.shape[0] != self._tile_height:
+            if stream['scratch'] is None:
+                stream['scratch'] = np.empty(
+                    (self._tile_height, self._tile_width, 3),
+                    dtype=np.uint8
+                )
+            image = cv2.resize(
+                image,
+                (self._tile_width, self._tile_height),
+                dst=stream['scratch']
+            )
+        self._textures.update_layer(layer, image)
+
+        now = time.perf_counter()
+        produced_sequence, produced_at = stream['produced']
+        if produced_sequence != sequence:
+            # Sources without notification are timed by the upload
+            produced_at = now
+        # Running mean of the time from production to upload
+        stream['latency'] += \
+            (now - produced_at - stream['latency']) / (stream['uploads'] + 1)
+        stream['sequence'] = sequence
+        stream['uploads'] += 1
+        stream['frame_time'] = produced_at
+
+    def dispose(self):
+        super().dispose()
+        self._vertexobj = None
+        self._textures = None
+        for stream in self._streams:
+            stream['sequence'] = 0
+
+    @property
+    def sources(self):
+        return tuple(self._sources)
+
+    @property
+    def grid(self):
+        count = max(len(self._sources), 1)
+        columns = self._columns or int(np.ceil(np.sqrt(count)))
+        rows = (count + columns - 1) // columns
+        return columns, rows
+
+    @property
+    def layout(self):
+        # (x, y, width, height) of tiles in normalized coordinates,
+        # the origin is the top left
+        columns, rows = self.grid
+        w, h = 1.0 / columns, 1.0 / rows
+        return [
+            ((i % columns) * w, (i // columns) * h, w, h)
+            for i in range(len(self._sources))
+        ]
+
+    @property
+    def stats(self):
+        # age: seconds since the shown frame was produced
+        # latency: mean seconds from production to upload
+        now = time.perf_counter()
+        stats = []
+        for stream in self._streams:
+            age = None
+            if stream['uploads'] > 0:
+                age = now - stream['frame_time']
+            stats.append({
+                'sequence': stream['sequence'],
+                'uploads': stream['uploads'],
+                'age': age,
+                'latency': stream['latency'],
+            })
+        return stats
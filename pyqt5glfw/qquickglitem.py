@@ -33,6 +33,8 @@ class QQuickGLItem(QQuickFramebufferObject):
     # 2. (int) btn status: 1: press, 2: release, 0: move
     # 3,4 (int) position
     mouseEvent = pyqtSignal(int, int, int, int)  # type, status, pos
+    # Emitted with the sequence number of a new frame of a watched source
+    frameAvailable = pyqtSignal(int)
 
     def __init__(self, parent=None):
         super(QQuickGLItem, self).__init__(
@@ -41,17 +43,38 @@ class QQuickGLItem(QQuickFramebufferObject):
 
         self.renderer = None
         self._qrenderer = None
+        # Repaints only on new frames, input and explicit update() if False
+        self._continuous = False
+        self._sources = []
+        # Samples of the framebuffer the item is rendered into
+        self._samples = 4
         self._qcolor = QColor.fromRgbF(0.0, 0.0, 0.0)
         self.windowChanged.connect(self._onWindowChanged)
         self.setProperty('focus', True)
         self.setProperty('mirrorVertically', True)
         self.setAcceptedMouseButtons(Qt.AllButtons)
+        # Sources notify from their capture threads, so it's queued
+        self.frameAvailable.connect(self.update, type=Qt.QueuedConnection)
 
         # from pyglfw.scene import load_fromjson
         # scene = load_fromjson('example/res/scene_rectangle.json')
         # self.keyPressed.connect(scene.camera.key_pressed)
         # self.renderer = scene
 
+    # Repaints whenever the source (pyglfw.video.FrameSource) has a new frame
+    def watch_source(self, source):
+        if source not in self._sources:
+            source.add_listener(self._onFrameAvailable)
+            self._sources.append(source)
+
+    def unwatch_source(self, source):
+        if source in self._sources:
+            source.remove_listener(self._onFrameAvailable)
+            self._sources.remove(source)
+
+    def _onFrameAvailable(self, sequence):
+        self.frameAvailable.emit(sequence)
+
     def createRenderer(self):
         self._qrenderer = QQuickRenderer()
         return self._qrenderer
@@ -102,6 +125,27 @@ class QQuickGLItem(QQuickFramebufferObject):
     def _onInvalidateUnderlay(self):
         self.setProperty('focus', False)
 
+    # Continuous mode repaints every frame at the display rate
+    @pyqtProperty(bool)
+    def continuous(self):
+        return self._continuous
+
+    @continuous.setter
+    def continuous(self, value):
+        if self._continuous != value:
+            self._continuous = value
+            self.update()
+
+    @pyqtProperty(int)
+    def samples(self):
+        return self._samples
+
+    @samples.setter
+    def samples(self, value):
+        if self._samples != value:
+            self._samples = value
+            self.update()
+
     @pyqtProperty(str)
     def color(self):
         return self._qcolor.name()
@@ -125,6 +169,8 @@ class QQuickRenderer(QQuickFramebufferObject.Renderer):
         self._renderer = None
         self._next_renderer = None
         self._qcolor = QColor.fromRgbF(0.0, 0.0, 0.0)
+        self._continuous = False
+        self._samples = 4
 
     def render(self):
         # todo: specify color
@@ -146,12 +192,15 @@ class QQuickRenderer(QQuickFramebufferObject.Renderer):
         if self._window is not None:
             self._window.resetOpenGLState()
 
+        if self._continuous:
+            self.update()
+
     def createFramebufferObject(self, size):
         format = QOpenGLFramebufferObjectFormat()
         format.setAttachment(
             QOpenGLFramebufferObject.CombinedDepthStencil
         )
-        format.setSamples(4)
+        format.setSamples(self._samples)
 
         self._qfbo = QOpenGLFramebufferObject(size, format)
         return self._qfbo
@@ -160,6 +209,11 @@ class QQuickRenderer(QQuickFramebufferObject.Renderer):
         # update data from main thread
         self._window = item.window()
         self._qcolor = item.qcolor
+        self._continuous = item.continuous
+        if self._samples != item.samples:
+            self._samples = item.samples
+            # Framebuffer is created again with the new sample count
+            self.invalidateFramebufferObject()
         self.renderer = item.renderer
 
     def _check_next_renderer(self):